@@ -1,9 +1,18 @@
+import time
+_MODULE_START = time.perf_counter()
 import random
 import os
-import time
 import sys
-import json
-import pygame  
+from array import array
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from itertools import count, islice
+from audio import NullAudio, PygameAudio
+from leaderboard import Leaderboard
+from pacing import Pacer, PacedStream
+from policies import DEFAULT_POLICY, POLICIES, get_policy
+
+_IMPORT_TIME = time.perf_counter() - _MODULE_START
 
 # ANSI escape codes for colored output
 class Colors:
@@ -23,11 +32,22 @@ VALUES = {
     'Q': 10, 'K': 10, 'A': 11
 }
 SUITS = ['♥', '♦', '♣', '♠']
+RANKS = list(VALUES.keys())
+
+# Cards in the shoe and in hands are single-byte codes: rank index * 4 + suit index.
+# Card objects are only built from a code when a hand is rendered.
+CARD_VALUES = [VALUES[rank] for rank in RANKS for suit in SUITS]
+ACE = RANKS.index('A')
 
-# File paths for saving data
-PLAYER_DATA_FILE = 'players.json'
-CURRENT_PLAYER_FILE = 'current_player.json'
-LEADERBOARD_FILE = 'leaderboard.json'
+# Hi-Lo count tag of each card code: 2-6 count +1, 7-9 count 0, tens and aces -1
+HI_LO = [1 if value <= 6 else (0 if value <= 9 else -1) for value in CARD_VALUES]
+
+# Shoe configuration
+MIN_DECKS = 1
+MAX_DECKS = 8
+DEFAULT_NUM_DECKS = 6
+DEFAULT_PENETRATION = 0.75  # Fraction of the shoe dealt before the cut card comes out
+CARDS_PER_HAND = 5  # Cards the shoe must hold for each hand at the table, the dealer's too; rounds average under 3
 
 # Card class
 class Card:
@@ -35,6 +55,10 @@ class Card:
         self.value = value
         self.suit = suit
 
+    @classmethod
+    def from_code(cls, code):
+        return cls(RANKS[code >> 2], SUITS[code & 3])
+
     def __str__(self):
         return f"{self.value}{self.suit}"
 
@@ -58,6 +82,50 @@ class Card:
     └───────┘
         """
 
+# Pre-split rows of each rendered card, keyed by (value, suit)
+_GLYPHS = {}
+
+def card_glyph(value, suit):
+    glyph = _GLYPHS.get((value, suit))
+    if glyph is None:
+        glyph = _GLYPHS[value, suit] = tuple(Card(value, suit).render().split('\n'))
+    return glyph
+
+def code_glyph(code):
+    return card_glyph(RANKS[code >> 2], SUITS[code & 3])
+
+# The dealer's hand with its hole card hidden, keyed by the upcard's code
+_HIDDEN_HANDS = {}
+
+def print_error(message):
+    print(Colors.RED + message + Colors.END)
+
+# Wall-clock time spent in each startup phase, for --startup-report
+class StartupTimer:
+    def __init__(self):
+        self.phases = {'imports': _IMPORT_TIME}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def total(self):
+        return time.perf_counter() - _MODULE_START
+
+    def report(self):
+        print(Colors.CYAN + "\nStartup report:" + Colors.END)
+        for name, seconds in self.phases.items():
+            print(f"  {name:<12} {seconds * 1000:8.1f} ms")
+        print(f"  {'total':<12} {self.total() * 1000:8.1f} ms")
+
+def startup_phase(startup, name):
+    # Time a phase only when a report was asked for
+    return startup.phase(name) if startup else nullcontext()
+
 # ASCII representation of money
 def render_money(amount):
     lines = [
@@ -68,230 +136,550 @@ def render_money(amount):
     ]
     return '\n'.join(lines)
 
+# ASCII art is kept in the assets folder and only read the first time it is shown
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+
+@lru_cache(maxsize=None)
+def load_art(name):
+    with open(os.path.join(ASSET_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
 # ASCII Joker Card
 def render_joker_card():
-    joker = """⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢀⡤⠖⠛⣻⣿⣻⣿⣿⣶⠶⣤⡀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⠀⠀ ⠀⠀⢀⡴⠶⣦⡀⠀⠀⠀⠀⠀⠀⢀⡴⢋⣤⠶⣟⣛⣿⡿⠿⣿⣿⣷⡾⣿⣆⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⠀⠀⠀ ⠀⢸⣇⣤⣿⡇⠀⠀⠀⠀⠀⢀⡞⣦⣨⣿⡳⠉⢛⣋⣤⣤⣘⣷⣿⡇⣼⣿⣷⡀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⠀⠀⠀ ⠀⢸⠉⣿⣭⡇⠀⠀⠀⠀⠀⢸⡁⣿⡟⠉⠉⠓⠻⠿⠿⠟⠛⠉⠀⠀⠉⢫⣿⡇⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⠀⠀⠀⠀ ⢸⠀⠈⠀⠇⠀⠀⠀⠀⠀⢸⡿⠷⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀   ⢨⣿⡇⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⠀⠀⠀⠀ ⢸⣦⣤⡿⣂⠀⠀⠀⠀⠀⠘⣿⣿⡶⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀  ⣿⣷⡄⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⠀⠀⠀⠀⠈⡇⠙⠋⢸⠀⠀⠀⠀⠀⢀⢿⣿⠁⠀⢀⣀⣤⣀⣀⠆⠀⣀⣤⣴⣶⣾⣿⣿⣿⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⠀⠀⠀⣠⠤⣿⠀⠀⢸⣀⣀⡀⠀⠀⣿⣻⣻⡂⠚⣫⣽⠿⣻⠟⢁⠀⣿⠛⠛⠹⠛⢿⣿⣿⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⠀⠀⢀⡇⠀⣾⠀⠀⠸⣇⣈⢹⣤⣄⠻⡿⡝⣇⠀⠀⠀⠈⠉⠀⠘⠚⣷⣄⠀⠀⠀⠘⣿⡏⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⠀⠀⣼⠟⠛⣿⠀⠀⠙⢯⠉⠳⣿⠾⣷⡿⣷⢮⢷⡀⠀⠀⣠⠦⣗⠀⣹⣽⣆⠀⠀⢠⡿⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⢀⡞⠉⡇⢸⡟⣆⠀⠀⠀⠀⠀⡤⢧⡈⡇⠈⠻⣆⠙⢤⣼⣯⣀⣈⣛⣿⠿⣯⡗⢀⣾⠃⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⣿⠛⠀⡇⢶⠀⠸⡄⠀⠀⠀⢸⠁⠀⢹⡇⠀⣰⣿⣄⠈⠃⠙⢿⣦⣤⡴⣾⢿⠇⢸⡿⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⠹⡀⢰⡇⠀⠀⠀⢻⠀⠀⠀⢸⡆⠀⠀⣷⣾⣿⣿⠈⢳⡀⠀⠀⠹⣷⣮⡵⠟⠀⣼⠇⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⠀⡇⠀⠀⠀⠀⠀⠐⠂⠀⠀⠀⠀⠀⠀⢹⣿⣿⣿⣧⡀⠘⠳⣄⠀⠀⠀⠀⢀⡴⣻⠀⠀⠰⣤⡀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⠀⠹⣄⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣼⣿⣿⣿⣿⣿⣦⡀⠈⠙⠒⠒⣺⣿⣶⣿⣿⣿⣶⣽⣿⣿⣦⣄⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⠀⠀⠀⠀⠈⠓⢄⠀⠀⠀⠀⠀⠀⠀⠀⠀⣰⣿⣿⣿⣿⣿⣿⣯⢳⣀⠀⢀⣼⣷⣤⣞⣛⠿⣿⠈⠀⢹⣿⣿⣿⣷⡄⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢀⣀⠀⠀⠀
-⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠳⢄⣀⡀⠀⠀⠀⠄⢰⡿⢿⣿⣿⣿⣿⣿⣿⣧⡻⣿⡿⠁⠈⠛⢿⣛⣻⣿⠀⠀⠀⢿⣿⣿⣿⣿⡀⠀⣀⣀⣤⣤⣴⣶⡾⠿⠿⣿⡄⠀⠀
-⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢈⣿⠀⠀⣀⣤⠖⠋⣠⣿⣿⣿⣿⣿⣿⣿⣿⣷⡄⠀⠀⠀⠀⠀⢹⠿⢛⣦⣀⣀⣨⣿⣿⣿⣿⣿⡿⢻⣿⣻⣭⣭⣤⣤⣄⠀⣿⣇⠀⠀
-⠀⠀⠀⠀⠀⠀⠀⠀⠀⢀⣴⡿⠟⠛⠉⠁⣀⣤⣾⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣄⣀⣠⣤⣴⣿⣶⡿⠿⠿⠛⠛⢩⣭⢻⣷⣿⣿⡿⠿⠈⣿⣿⠉⠻⣿⡆⠸⣿⠀⠀
-⠀⠀⠀⠀⠀⠀⠀⠀⠠⣎⣁⣠⣴⣶⣾⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⡿⠿⠿⠛⠋⣙⣽⣦⣄⠀⢿⣷⡀⠀⢸⣿⠘⣿⣧⠀⠀⠀⠀⢹⣿⣶⣾⣿⣇⠀⣿⣆⠀
-⠀⠀⠀⠀⠀⠀⠀⠀⠀⢿⣿⣿⣿⣿⣿⣿⣿⣿⣿⡿⠿⢿⡛⣿⣯⣭⣴⣾⣿⠁⠀⠀⢰⣿⡟⠛⢿⣷⠈⢿⣧⠀⢸⣿⠀⢹⣿⣿⠿⠇⠀⠘⣿⡏⠉⢹⣿⡄⢸⣿⠀
-⠀⠀⠀⢀⣀⣀⣤⣤⣶⣾⡿⠿⢿⠻⠛⠋⣽⣅⠀⠀⢠⣿⣇⠸⣿⡟⠋⠉⠁⠀⠀⠀⠘⣿⡇⠀⠸⣿⡆⠈⢿⣷⣸⣿⠀⠘⣿⣇⢀⣀⣀⡄⢹⣿⡄⠈⠿⠷⠘⣿⡆
-⠰⣶⡿⠿⠛⣛⣫⣉⠉⠀⢠⣾⣿⣿⣷⡄⢸⣿⣷⣤⣾⣿⣿⠀⣿⣷⣤⣶⣦⠀⠀⠀⠀⢿⣿⠀⠀⣿⣧⠀⠈⢿⣿⣿⠀⠀⢿⣿⠿⠿⠛⠃⢈⣋⣤⣤⣴⣶⣶⡿⠇
-⠀⣿⣇⠀⣼⣿⠿⢿⣿⣆⣿⣿⠀⠈⢿⣷⠈⣿⡏⢿⣿⠉⣿⡇⢸⣿⡏⠉⠁⠀⠀⠀⠀⠘⢿⣷⣶⣿⠏⠀⠀⠈⠛⢃⣀⣀⣤⣴⣶⣾⠿⠿⠿⠛⠋⠉⠉⠀⠀⠀⠀
-⠀⠸⣿⠀⢿⣿⠀⠀⢙⣃⠘⣿⣷⣶⣾⣿⡆⢻⣿⠀⠀⠀⢻⣿⠈⣿⣷⣶⣶⣿⠇⠀⠀⠀⢀⣈⣉⣤⣴⣶⣶⠿⠿⠟⠛⠋⠉⠁⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⣿⡇⢸⣿⡆⢸⣿⣿⡀⢿⣿⠉⠈⣿⣧⠸⣿⣧⠀⠀⠘⠿⡃⢘⣉⣡⣤⣤⣴⣾⠿⠿⠟⠛⠛⠋⠁⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⢸⣿⠀⢿⣷⣤⣼⣿⠀⠸⣿⠆⠀⠘⣛⣀⣩⣥⣤⣶⣶⣿⠿⠟⠛⠛⠉⠉⠁⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠈⣿⡇⠀⠉⠛⣋⣡⣤⣤⣶⣶⣶⠿⠟⠛⠛⠉⠉⠁⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-⠀⠀⠀⢻⣿⣾⠿⠿⠟⠛⠉⠉⠁⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀"""
+    joker = load_art('joker.txt')
     play_again = "Play Again?"
     return f"{joker}\n{play_again.center(len(joker))}"
 
 # Function to display the ASCII Art Title
 def display_title():
-    title = """
- ██████╗ ██████╗ ███████╗███████╗████████╗██╗███╗   ██╗     ██████╗  █████╗ ███╗   ███╗██████╗ ██╗     ██╗███╗   ██╗ ██████╗ 
-██╔════╝ ██╔══██╗██╔════╝██╔════╝╚══██╔══╝██║████╗  ██║    ██╔════╝ ██╔══██╗████╗ ████║██╔══██╗██║     ██║████╗  ██║██╔════╝ 
-██║  ███╗██████╔╝█████╗  ███████╗   ██║   ██║██╔██╗ ██║    ██║  ███╗███████║██╔████╔██║██████╔╝██║     ██║██╔██╗ ██║██║  ███╗
-██║   ██║██╔══██╗██╔══╝  ╚════██║   ██║   ██║██║╚██╗██║    ██║   ██║██╔══██║██║╚██╔╝██║██╔══██╗██║     ██║██║╚██╗██║██║   ██║
-╚██████╔╝██║  ██║███████╗███████║   ██║   ██║██║ ╚████║    ╚██████╔╝██║  ██║██║ ╚═╝ ██║██████╔╝███████╗██║██║ ╚████║╚██████╔╝
- ╚═════╝ ╚═╝  ╚═╝╚══════╝╚══════╝   ╚═╝   ╚═╝╚═╝  ╚═══╝     ╚═════╝ ╚═╝  ╚═╝╚═╝     ╚═╝╚═════╝ ╚══════╝╚═╝╚═╝  ╚═══╝ ╚═════╝ 
-                                                                                                                            
-                                                                                                                                                                """
+    title = load_art('title.txt')
     print(Colors.RED + title + Colors.END)
 
-# Deck class
+# Every table draws from its own random.Random, seeded from a recorded seed,
+# so any session can be played again card for card
+def new_seed():
+    return random.SystemRandom().getrandbits(63)
+
+# Most seats a shoe can deal a round to: with more, one round could use up
+# every card, and cards still on the table would have to be dealt again
+def max_seats(num_decks):
+    return num_decks * len(CARD_VALUES) // CARDS_PER_HAND - 1
+
+# Deck class: a shoe of 1-8 decks stored as an array of card codes.
+# Dealing just moves a position forward, and the shoe is reshuffled between
+# rounds once the cut card has come out. The Hi-Lo running count and the
+# number of each rank left are updated as every card is dealt.
 class Deck:
-    def __init__(self):
-        self.cards = [Card(value, suit) for value in VALUES.keys() for suit in SUITS]
+    def __init__(self, num_decks=DEFAULT_NUM_DECKS, penetration=DEFAULT_PENETRATION, on_reshuffle=None, rng=None):
+        if not MIN_DECKS <= num_decks <= MAX_DECKS:
+            raise ValueError(f"Number of decks must be between {MIN_DECKS} and {MAX_DECKS}.")
+        if not 0 < penetration <= 1:
+            raise ValueError("Penetration must be greater than 0 and at most 1.")
+        self.num_decks = num_decks
+        self.penetration = penetration
+        self.cards = array('B', range(len(CARD_VALUES))) * num_decks
+        self.cut_card = max(1, int(len(self.cards) * penetration))
+        self.position = 0  # Index of the next card to deal
+        self.on_reshuffle = on_reshuffle  # Called after the shoe is reshuffled
+        self.rng = rng or random.Random()
+        self.shuffles = 0  # Number of times the shoe has been shuffled
         self.shuffle()
 
     def shuffle(self):
-        random.shuffle(self.cards)
+        self.rng.shuffle(self.cards)
+        self.position = 0
+        self.round_start = 0  # Cards before this one were played in earlier rounds
+        self.shuffles += 1
+        self._running_count = 0
+        self._remaining = [len(SUITS) * self.num_decks] * len(RANKS)  # Cards left of each rank
+
+    @property
+    def running_count(self):
+        return self._running_count
+
+    @property
+    def true_count(self):
+        # Running count per deck left in the shoe
+        decks_left = (len(self.cards) - self.position) / len(CARD_VALUES)
+        return self._running_count / decks_left if decks_left else 0.0
+
+    def remaining_ranks(self):
+        return dict(zip(RANKS, self._remaining))
+
+    def reshuffle_if_needed(self):
+        # Only called between rounds, so a hand is never split across two shuffles
+        if self.position < self.cut_card:
+            self.round_start = self.position
+            return False
+        self.shuffle()
+        if self.on_reshuffle:
+            self.on_reshuffle()
+        return True
 
     def deal_card(self):
-        if len(self.cards) == 0:
-            self.__init__()  # Reinitialize and shuffle if deck is empty
-            print(Colors.YELLOW + "\nDeck is reshuffled." + Colors.END)
-            time.sleep(1.5)  # Increased delay for readability
-        return self.cards.pop()
+        position = self.position
+        if position == len(self.cards):
+            position = self.shuffle_discards()
+        self.position = position + 1
+        card = self.cards[position]
+        self._running_count += HI_LO[card]
+        self._remaining[card >> 2] -= 1
+        return card
+
+    def shuffle_discards(self):
+        # The shoe ran dry mid-round: the cards of earlier rounds are shuffled
+        # and dealt on, while the cards on the table stay out of play
+        discards = self.cards[:self.round_start]
+        if not discards:
+            raise RuntimeError("The shoe ran out of cards in the middle of a round.")
+        self.rng.shuffle(discards)
+        self.cards = self.cards[self.round_start:] + discards
+        self.position = len(self.cards) - len(discards)
+        self.round_start = 0  # Never shuffle the cards on the table
+        self.shuffles += 1
+        self._running_count = 0
+        self._remaining = [0] * len(RANKS)
+        for card in discards:
+            self._remaining[card >> 2] += 1
+        if self.on_reshuffle:
+            self.on_reshuffle()
+        return self.position
 
     def cards_left(self):
-        return len(self.cards)
+        return len(self.cards) - self.position
 
-# Hand class
+    def save_state(self):
+        # Where the shoe is, for dealing the same cards again with restore_state;
+        # the order of the cards is only kept until the next shuffle
+        return self.position, self.shuffles, self._running_count, self._remaining[:]
+
+    def restore_state(self, state):
+        self.position, self.shuffles, self._running_count, remaining = state
+        self._remaining = remaining[:]
+
+# Hand class: the totals are kept up to date as cards are added,
+# so value and bust checks never rescan the cards
 class Hand:
+    __slots__ = ('cards', 'is_doubled', 'hard_total', 'aces', 'soft_aces', 'value', 'is_blackjack', 'busted',
+                 'rows', 'rendered')
+
     def __init__(self):
         self.cards = []
         self.is_doubled = False  # Track if the hand has been doubled down
+        self.hard_total = 0  # Total with every ace counted as 1
+        self.aces = 0
+        self.soft_aces = 0  # Aces still counted as 11
+        self.value = 0
+        self.is_blackjack = False
+        self.busted = False
+        self.rows = None  # Rendered rows of the cards drawn so far
+        self.rendered = 0  # Number of cards already in self.rows
 
     def add_card(self, card):
         self.cards.append(card)
-
-    def calculate_value(self):
-        value = sum(VALUES[card.value] for card in self.cards)
+        card_value = CARD_VALUES[card]
+        value = self.value + card_value
+        if card_value == 11:
+            self.aces += 1
+            self.soft_aces += 1
+            self.hard_total += 1
+        else:
+            self.hard_total += card_value
         # Adjust for aces if total is over 21
-        aces = sum(1 for card in self.cards if card.value == 'A')
-        while value > 21 and aces:
+        while value > 21 and self.soft_aces:
             value -= 10
-            aces -= 1
-        return value
+            self.soft_aces -= 1
+        self.value = value
+        self.is_blackjack = value == 21 and len(self.cards) == 2
+        self.busted = value > 21
+
+    def calculate_value(self):
+        return self.value
 
     def description(self):
-        value = self.calculate_value()
-        aces = sum(1 for card in self.cards if card.value == 'A')
-        if len(self.cards) == 2 and value == 21:
+        if self.is_blackjack:
             return Colors.GREEN + "Natural Blackjack!" + Colors.END
-        elif aces == 0:
+        elif self.aces == 0:
             return "Hard Hand."
-        elif aces > 0 and value <= 21:
+        elif self.value <= 21:
             return "Soft Hand."
         else:
             return "Hand."
 
     def render_hand(self, hide_first_card=False):
         if hide_first_card:
-            rendered_cards = [self.cards[0].render(), Card('?', '?').render()]
-        else:
-            rendered_cards = [card.render() for card in self.cards]
-        card_lines = [card.split('\n') for card in rendered_cards]
-        combined_lines = [''.join(line) for line in zip(*card_lines)]
-        return '\n'.join(combined_lines)
+            upcard = self.cards[0]
+            hidden = _HIDDEN_HANDS.get(upcard)
+            if hidden is None:
+                rows = zip(code_glyph(upcard), card_glyph('?', '?'))
+                hidden = _HIDDEN_HANDS[upcard] = '\n'.join(''.join(row) for row in rows)
+            return hidden
+        # Only append the columns of cards dealt since the last render
+        if self.rendered < len(self.cards):
+            rows = self.rows
+            for card in self.cards[self.rendered:]:
+                glyph = code_glyph(card)
+                rows = list(glyph) if rows is None else [row + line for row, line in zip(rows, glyph)]
+            self.rows = rows
+            self.rendered = len(self.cards)
+        return '\n'.join(self.rows) if self.rows else ''
 
     def is_bust(self):
-        return self.calculate_value() > 21
+        return self.busted
+
+# List of "Papers, Please" style names
+AI_NAMES = [
+    "Aleksandr Ivanov",
+    "Boris Petrov",
+    "Cecilia Sokolova",
+    "Dmitri Volkov",
+    "Elena Morozova",
+    "Fedor Kuznetsov",
+    "Galina Smirnova",
+    "Igor Popov",
+    "Katerina Orlova",
+    "Leonid Mikhailov"
+]
+# Every first name with every surname gives the names after AI_NAMES;
+# women take the feminine form of the surname
+AI_FIRST_NAMES = [("Aleksandr", False), ("Boris", False), ("Cecilia", True), ("Dmitri", False), ("Elena", True),
+                  ("Fedor", False), ("Galina", True), ("Igor", False), ("Katerina", True), ("Leonid", False)]
+AI_SURNAMES = ["Ivanov", "Petrov", "Sokolov", "Volkov", "Morozov", "Kuznetsov", "Smirnov", "Popov", "Orlov", "Mikhailov"]
+
+AI_ANNOUNCED = 5  # Larger groups are added without a line per player
+
+def ai_names():
+    # Unique AI names without end, always in the same order: AI_NAMES, then the
+    # other first name and surname pairs, then all of those again numbered 2, 3, ...
+    yield from AI_NAMES
+    used = set(AI_NAMES)
+    pairs = [f"{first} {surname}a" if feminine else f"{first} {surname}"
+             for surname in AI_SURNAMES for first, feminine in AI_FIRST_NAMES]
+    pairs = AI_NAMES + [name for name in pairs if name not in used]
+    yield from pairs[len(AI_NAMES):]
+    for number in count(2):
+        for name in pairs:
+            yield f"{name} {number}"
+
+# Starting balance for new human and AI players
+STARTING_BALANCE = 1000
+# Leaderboard entries shown per page
+LEADERBOARD_PAGE_SIZE = 20
+# Balance above which the house steps in
+HIGH_WIN_BALANCE = 10000
+
+# AI seats bet and play by their 'policy' (see policies.py). The engine asks
+# each policy once for all of its seats at the table, in seat order.
+def group_by_policy(players):
+    # [(policy, seat indexes)]; the indexes are None when every seat plays the same policy
+    policies = {player.policy for player in players}
+    if len(policies) <= 1:
+        return [(policy, None) for policy in policies]
+    groups = {}
+    for index, player in enumerate(players):
+        groups.setdefault(player.policy, []).append(index)
+    return list(groups.items())
+
+# A seat at the table, human or AI. Seats use __slots__ rather than a dict per
+# seat, since load tests put thousands of AI seats at one table.
+class Seat:
+    __slots__ = ('name', 'balance', 'hand', 'is_ai', 'policy', 'bet')
+
+    def __init__(self, name, balance=STARTING_BALANCE, is_ai=False, policy=None):
+        self.name = name
+        self.balance = balance
+        self.hand = Hand()
+        self.is_ai = is_ai
+        self.policy = policy  # How an AI seat bets and plays
+        self.bet = None  # This round's stake; None between rounds
+
+def seat_policies(names, num_seats, num_decks):
+    # Policies for the AI seats, handing out the names in turn
+    names = names or [DEFAULT_POLICY]
+    return [get_policy(names[seat % len(names)], num_decks) for seat in range(num_seats)]
+
+# Round engine: the game logic of one round with no terminal I/O.
+# A round moves through deal -> player turns -> dealer turn -> settlement.
+# The terminal UI drives it step by step; run_headless drives it at full speed.
+class RoundEngine:
+    DEAL = 'deal'
+    PLAYER_TURNS = 'player_turns'
+    DEALER_TURN = 'dealer_turn'
+    SETTLEMENT = 'settlement'
+    DONE = 'done'
+
+    # Events returned by apply_move that end a player's turn
+    TURN_OVER = ('stand', 'bust', 'double', 'double_bust')
+
+    def __init__(self, deck, players):
+        self.deck = deck
+        self.players = players
+        self.dealer = Hand()
+        self.phase = RoundEngine.DEAL
+        self.reshuffled = False
+        self.shoe_position = 0  # Shoe position of the round's first card
+        self.running_count = 0  # Count before the round's first card
+        self.true_count = 0.0
+        self.upcard = 0  # Value of the dealer's upcard, as policies see it
+        self.ai_players = [player for player in players if player.policy is not None]
+        self.ai_groups = group_by_policy(self.ai_players)
+
+    def deal(self):
+        self.reshuffled = self.deck.reshuffle_if_needed()
+        self.shoe_position = self.deck.position
+        self.running_count = self.deck.running_count
+        self.true_count = self.deck.true_count
+        for player in self.players:
+            player.hand = Hand()
+            player.hand.add_card(self.deck.deal_card())
+            player.hand.add_card(self.deck.deal_card())
+        self.dealer = Hand()
+        self.dealer.add_card(self.deck.deal_card())
+        self.dealer.add_card(self.deck.deal_card())
+        self.upcard = CARD_VALUES[self.dealer.cards[0]]
+        self.phase = RoundEngine.PLAYER_TURNS
+        return self.dealer
+
+    def place_bet(self, player, bet):
+        player.bet = bet
+        player.balance -= bet
+
+    def can_double(self, player):
+        # A hand can only be doubled once, and only if the balance covers it
+        return not player.hand.is_doubled and player.bet * 2 <= player.balance
+
+    def seat_state(self, player):
+        # What a policy sees of a seat: (total, soft, can_double), with can_double inlined
+        hand = player.hand
+        return hand.value, hand.soft_aces > 0, not hand.is_doubled and player.bet * 2 <= player.balance
+
+    # The AI seats' bets and first moves are decided with one call per policy,
+    # and come back in the order of self.ai_players
+    def place_ai_bets(self):
+        for policy, indexes in self.ai_groups:
+            players = self.ai_players if indexes is None else [self.ai_players[index] for index in indexes]
+            for player, bet in zip(players, policy.decide_bets([player.balance for player in players], self.true_count)):
+                player.bet = bet
+                player.balance -= bet
+
+    def first_moves(self):
+        # Moves after the first depend on the cards drawn by the seats before,
+        # so they are asked for one at a time with next_move
+        players = self.ai_players
+        seat_state = self.seat_state
+        moves = [None] * len(players)
+        for policy, indexes in self.ai_groups:
+            if indexes is None:
+                return policy.decide_moves([seat_state(player) for player in players], self.upcard)
+            decided = policy.decide_moves([seat_state(players[index]) for index in indexes], self.upcard)
+            for index, move in zip(indexes, decided):
+                moves[index] = move
+        return moves
+
+    def next_move(self, player):
+        return player.policy.decide_moves([self.seat_state(player)], self.upcard)[0]
+
+    def apply_move(self, player, move):
+        hand = player.hand
+        if move == 'h':
+            hand.add_card(self.deck.deal_card())
+            return 'bust' if hand.is_bust() else 'hit'
+        if move == 'd':
+            if not self.can_double(player):
+                return 'no_double'
+            player.bet *= 2
+            player.balance -= player.bet / 2  # Deduct the additional bet
+            hand.is_doubled = True
+            hand.add_card(self.deck.deal_card())
+            return 'double_bust' if hand.is_bust() else 'double'
+        return 'stand'
+
+    def play_turn(self, player, choose_move):
+        # Play a whole turn without any I/O, asking choose_move(player) for each move
+        while True:
+            event = self.apply_move(player, choose_move(player))
+            if event in RoundEngine.TURN_OVER:
+                return event
+
+    def play_ai_turn(self, player, move):
+        # Play an AI seat's whole turn from its first move
+        while True:
+            event = self.apply_move(player, move)
+            if event in RoundEngine.TURN_OVER:
+                return event
+            move = self.next_move(player)
+
+    def start_dealer_turn(self):
+        # The dealer only plays if at least one player hasn't busted
+        self.phase = RoundEngine.DEALER_TURN
+        return any(not player.hand.is_bust() for player in self.players)
+
+    def dealer_should_hit(self):
+        return self.dealer.calculate_value() < 17
+
+    def dealer_hit(self):
+        self.dealer.add_card(self.deck.deal_card())
+
+    def finish_dealer_turn(self):
+        self.phase = RoundEngine.SETTLEMENT
+        dealer_value = self.dealer.calculate_value()
+        return dealer_value, dealer_value > 21
+
+    def play_dealer(self):
+        if self.start_dealer_turn():
+            while self.dealer_should_hit():
+                self.dealer_hit()
+        return self.finish_dealer_turn()
+
+    def settle(self, player, dealer_value, dealer_bust):
+        # Credit the player's payout and return (outcome, winnings)
+        hand = player.hand
+        if hand.is_bust():
+            return 'bust', 0
+        if dealer_bust:
+            outcome = 'dealer_bust'
+        else:
+            player_value = hand.calculate_value()
+            if player_value > dealer_value:
+                outcome = 'win'
+            elif player_value < dealer_value:
+                return 'loss', 0
+            else:
+                player.balance += player.bet
+                return 'push', player.bet
+        winnings = player.bet * 2
+        player.balance += winnings
+        return outcome, winnings
+
+    def finish(self):
+        # Reset all players' bets for the next round
+        for player in self.players:
+            player.bet = None
+        self.phase = RoundEngine.DONE
+
+# Phase labels for the round timers (see metrics.py)
+DEAL_PHASE = (('phase', 'deal'),)
+# Turns are timed by kind of seat, not by name, so the series stay few however many seats come and go
+HUMAN_TURN_PHASE = (('phase', 'turn'), ('kind', 'human'))
+AI_TURN_PHASE = (('phase', 'turn'), ('kind', 'ai'))
+DEALER_PHASE = (('phase', 'dealer'),)
+SETTLEMENT_PHASE = (('phase', 'settlement'),)
+HIGH_WIN_PHASE = (('phase', 'high_win'),)
+PERSISTENCE_PHASE = (('phase', 'persistence'),)
 
 # BlackjackGame class
 class BlackjackGame:
-    def __init__(self):
-        self.deck = Deck()
+    def __init__(self, num_decks=DEFAULT_NUM_DECKS, penetration=DEFAULT_PENETRATION, storage=None, pacer=None, audio=None,
+                 startup=None, recorder=None, seed=None, metrics_path=None, profiler=None):
+        self.startup = startup  # StartupTimer when --startup-report is on
+        self.recorder = recorder  # HandRecorder when --record is on
+        self.profiler = profiler  # Told about every round when --profile is on
+        self.metrics_path = metrics_path  # Where --metrics exports after every round
+        self.pacer = pacer or Pacer()
+        from metrics import Metrics
+        self.metrics = Metrics(pause_clock=lambda: self.pacer.total_waited)
+        self.seed = new_seed() if seed is None else seed
+        # The shoe's RNG is used for nothing else, so the seed alone decides every shuffle
+        self.rng = random.Random(f"{self.seed}:names")
+        with startup_phase(startup, 'deck'):
+            self.deck = Deck(num_decks, penetration, on_reshuffle=self.announce_reshuffle, rng=random.Random(self.seed))
+            get_policy(DEFAULT_POLICY, num_decks)  # Solve or load the strategy table up front
         self.players = []  # Active players (one human, multiple AI)
-        self.leaderboard = self.load_leaderboard()
+        self.screen = None  # The FrameRenderer while the game runs on a terminal
+        with startup_phase(startup, 'storage'):
+            if storage is None:
+                from storage import JsonStorage
+                storage = JsonStorage(warn=print_error)
+            self.storage = storage
+            self.leaderboard = Leaderboard(self.storage)
+            self.current_player_name = self.load_current_player()
         self.ai_player_count = 0  # To generate unique AI player names
-        self.current_player_name = self.load_current_player()
-
-        # List of "Papers, Please" style names
-        self.ai_names = [
-            "Aleksandr Ivanov",
-            "Boris Petrov",
-            "Cecilia Sokolova",
-            "Dmitri Volkov",
-            "Elena Morozova",
-            "Fedor Kuznetsov",
-            "Galina Smirnova",
-            "Igor Popov",
-            "Katerina Orlova",
-            "Leonid Mikhailov"
-        ]
-        self.available_ai_names = self.ai_names.copy()
 
-        # Initialize pygame mixer for background music
-        pygame.mixer.init()
-        self.background_music_file = 'background_music.mp3'  # Ensure this file exists
-        self.victory_music_file = 'victory_music.mp3'        # Ensure this file exists
-        self.play_background_music()
+        self.available_ai_names = list(AI_NAMES)
+        self.extra_ai_names = islice(ai_names(), len(AI_NAMES), None)  # Once AI_NAMES are all seated
+
+        # pygame and the mixer are only started in the background on first use
+        with startup_phase(startup, 'audio'):
+            self.audio = audio or PygameAudio(warn=print_error)
+            self.play_background_music()
 
     def play_background_music(self):
-        if os.path.exists(self.background_music_file):
-            pygame.mixer.music.load(self.background_music_file)
-            pygame.mixer.music.play(-1)  # Loop indefinitely
-        else:
-            print(Colors.RED + f"Background music file '{self.background_music_file}' not found." + Colors.END)
+        self.audio.play_background_music()
 
     def switch_to_victory_music(self):
-        if os.path.exists(self.victory_music_file):
-            pygame.mixer.music.load(self.victory_music_file)
-            pygame.mixer.music.play(-1)  # Loop indefinitely
-        else:
-            print(Colors.RED + f"Victory music file '{self.victory_music_file}' not found." + Colors.END)
+        self.audio.switch_to_victory_music()
 
     def stop_music(self):
-        pygame.mixer.music.stop()
+        self.audio.stop_music()
+
+    def announce_reshuffle(self):
+        print(Colors.YELLOW + "\nDeck is reshuffled." + Colors.END)
+        self.pacer.wait(1.5)  # Increased delay for readability
 
     def clear_screen(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
+        # Show the last screen and let it be read, then start the next one.
+        # Off a terminal nothing is cleared, and the output just runs on.
+        sys.stdout.flush()
+        self.pacer.flush()
+        if self.screen:
+            self.screen.new_frame()
+        self.audio.report_warnings()  # Anything the music thread hit since the last screen
+
+    def ask(self, prompt):
+        if not self.screen:
+            return input(prompt)
+        sys.stdout.flush()  # Take any pending pause before the prompt appears
+        return self.screen.ask(prompt)
 
     def load_players(self):
-        if os.path.exists(PLAYER_DATA_FILE):
-            try:
-                with open(PLAYER_DATA_FILE, 'r') as f:
-                    saved_players = json.load(f)
-                    # Return saved players as a dictionary
-                    return saved_players
-            except json.JSONDecodeError:
-                print(Colors.RED + "Error: 'players.json' is corrupted or contains invalid JSON. Resetting player data." + Colors.END)
-                return {}
-        else:
-            return {}
+        # Return saved players as a dictionary
+        return self.storage.load_players()
 
     def save_players_to_file(self, players_data):
-        with open(PLAYER_DATA_FILE, 'w') as f:
-            json.dump(players_data, f, indent=4)
+        with self.storage.batch():
+            for name, data in players_data.items():
+                self.storage.save_player(name, data['balance'])
+
+    def save_player_balances(self):
+        # Update the saved balances of the human players at the table
+        with self.storage.batch():
+            for player in self.players:
+                if not player.is_ai:
+                    self.storage.save_player(player.name, player.balance)
 
     def load_current_player(self):
-        if os.path.exists(CURRENT_PLAYER_FILE):
-            try:
-                with open(CURRENT_PLAYER_FILE, 'r') as f:
-                    data = json.load(f)
-                    return data.get('current_player')
-            except json.JSONDecodeError:
-                print(Colors.RED + "Error: 'current_player.json' is corrupted or contains invalid JSON. Resetting current player." + Colors.END)
-                return None
-        else:
-            return None
+        return self.storage.load_current_player()
 
     def save_current_player(self, player_name):
-        with open(CURRENT_PLAYER_FILE, 'w') as f:
-            json.dump({'current_player': player_name}, f, indent=4)
+        self.storage.save_current_player(player_name)
         self.current_player_name = player_name  # Update the attribute immediately
 
     def load_leaderboard(self):
-        if os.path.exists(LEADERBOARD_FILE):
-            try:
-                with open(LEADERBOARD_FILE, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print(Colors.RED + "Error: 'leaderboard.json' is corrupted or contains invalid JSON. Resetting leaderboard data." + Colors.END)
-                return {}
-        return {}
+        return self.storage.load_leaderboard()
 
     def save_leaderboard(self):
-        with open(LEADERBOARD_FILE, 'w') as f:
-            json.dump(self.leaderboard, f, indent=4)
-
-    def get_player_move(self, player):
-        if player.get('is_ai', False):
-            # Simple AI logic: hit if value < 17, else stand
-            value = player['hand'].calculate_value()
-            if value < 17:
-                move = 'h'
-                print(Colors.MAGENTA + f"{player['name']} chooses to hit." + Colors.END)
+        # Write the entries changed since the last save
+        self.leaderboard.flush()
+
+    def get_player_move(self, player, move=None):
+        # move is an AI seat's first move, decided with the rest of the table
+        if player.is_ai:
+            if move is None:
+                move = self.engine.next_move(player)
+            if move == 'h':
+                print(Colors.MAGENTA + f"{player.name} chooses to hit." + Colors.END)
+            elif move == 'd':
+                print(Colors.MAGENTA + f"{player.name} chooses to double down." + Colors.END)
             else:
-                move = 's'
-                print(Colors.MAGENTA + f"{player['name']} chooses to stand." + Colors.END)
-            time.sleep(1.5)  # Increased delay for readability
+                print(Colors.MAGENTA + f"{player.name} chooses to stand." + Colors.END)
+            self.pacer.wait(1.5)  # Increased delay for readability
             return move
         else:
             while True:
-                move = input(f"{player['name']}, do you want to hit, stand, or double down? (h/s/d): ").strip().lower()
+                move = self.ask(f"{player.name}, do you want to hit, stand, or double down? (h/s/d): ").strip().lower()
                 if move in ['h', 's', 'd']:
                     # If player has already doubled down, they can't double again
-                    if move == 'd' and (player['hand'].is_doubled or player['bet'] * 2 > player['balance']):
+                    if move == 'd' and (player.hand.is_doubled or player.bet * 2 > player.balance):
                         print(Colors.RED + "Cannot double down." + Colors.END)
                     else:
                         return move
@@ -302,40 +690,36 @@ class BlackjackGame:
         self.clear_screen()
         print(Colors.BLUE + "Dealer's Hand:" + Colors.END)
         print(self.dealer.render_hand(hide_first_card=hide_dealer_card))
-        print("\n" + Colors.YELLOW + f"{player['name']}'s Hand:" + Colors.END)
-        print(f"Balance:\n{render_money(player['balance'])}")
-        print(player['hand'].render_hand())
-        print(f"Value: {player['hand'].calculate_value()} - {player['hand'].description()}\n")
+        print("\n" + Colors.YELLOW + f"{player.name}'s Hand:" + Colors.END)
+        print(f"Balance:\n{render_money(player.balance)}")
+        print(player.hand.render_hand())
+        print(f"Value: {player.hand.calculate_value()} - {player.hand.description()}\n")
 
     def display_result(self, player, dealer_value, dealer_bust):
         self.clear_screen()
-        print(f"{player['name']}'s Result:")
-        if player['hand'].is_bust():
+        print(f"{player.name}'s Result:")
+        outcome, winnings = self.engine.settle(player, dealer_value, dealer_bust)
+        if outcome in ('dealer_bust', 'win'):
+            self.update_leaderboard(player.name, winnings - player.bet)
+        if outcome == 'bust':
+            self.metrics.inc('busts')
             print(Colors.RED + "Bust! You lose your bet." + Colors.END)
-        elif dealer_bust:
-            winnings = player['bet'] * 2
-            player['balance'] += winnings
-            self.update_leaderboard(player['name'], winnings - player['bet'])
+        elif outcome == 'dealer_bust':
             print(Colors.GREEN + f"Dealer busts! You win ${winnings}." + Colors.END)
+        elif outcome == 'win':
+            print(Colors.GREEN + f"You win! You receive ${winnings}." + Colors.END)
+        elif outcome == 'loss':
+            print(Colors.RED + "Dealer wins. You lose your bet." + Colors.END)
         else:
-            player_value = player['hand'].calculate_value()
-            if player_value > dealer_value:
-                winnings = player['bet'] * 2
-                player['balance'] += winnings
-                self.update_leaderboard(player['name'], winnings - player['bet'])
-                print(Colors.GREEN + f"You win! You receive ${winnings}." + Colors.END)
-            elif player_value < dealer_value:
-                print(Colors.RED + "Dealer wins. You lose your bet." + Colors.END)
-            else:
-                player['balance'] += player['bet']
-                print(Colors.YELLOW + "It's a tie! Your bet is returned." + Colors.END)
-        time.sleep(2)  # Increased delay for readability
+            print(Colors.YELLOW + "It's a tie! Your bet is returned." + Colors.END)
+        self.pacer.wait(2)  # Increased delay for readability
+        return outcome, winnings
 
     def display_joker_card(self):
         self.clear_screen()
         print(render_joker_card())
         while True:
-            choice = input("Would you like to play again? (y/n): ").strip().lower()
+            choice = self.ask("Would you like to play again? (y/n): ").strip().lower()
             if choice == 'y':
                 return True
             elif choice == 'n':
@@ -343,108 +727,124 @@ class BlackjackGame:
             else:
                 print(Colors.RED + "Invalid input. Please enter 'y' or 'n'." + Colors.END)
 
-    def play_round(self):
-        # Initial deal
-        for player in self.players:
-            player['hand'] = Hand()
-            player['hand'].add_card(self.deck.deal_card())
-            player['hand'].add_card(self.deck.deal_card())
-        self.dealer = Hand()
-        self.dealer.add_card(self.deck.deal_card())
-        self.dealer.add_card(self.deck.deal_card())
+    def play_player_turn(self, player, first_move=None):
+        # One seat's bet and moves; returns the event that ended the turn.
+        # first_move is an AI seat's first move, decided with the rest of the table.
+        self.display_player_hand(player)
+        if not player.is_ai:
+            # Human player
+            if player.bet is None:
+                while True:
+                    try:
+                        bet = float(self.ask(f"{player.name}, enter your bet: $"))
+                        if 0 < bet <= player.balance:
+                            self.engine.place_bet(player, bet)
+                            break
+                        else:
+                            print(Colors.RED + "Invalid bet amount." + Colors.END)
+                    except ValueError:
+                        print(Colors.RED + "Please enter a valid number." + Colors.END)
+        else:
+            # AI player, whose bet is already placed
+            print(Colors.CYAN + f"{player.name} places a bet of ${player.bet}." + Colors.END)
+            self.pacer.wait(1.5)  # Increased delay
 
-        # Players' turns
-        for player in self.players:
-            self.display_player_hand(player)
-            if not player.get('is_ai', False):
-                # Human player
-                if 'bet' not in player:
-                    while True:
-                        try:
-                            bet = float(input(f"{player['name']}, enter your bet: $"))
-                            if 0 < bet <= player['balance']:
-                                player['bet'] = bet
-                                player['balance'] -= bet
-                                break
-                            else:
-                                print(Colors.RED + "Invalid bet amount." + Colors.END)
-                        except ValueError:
-                            print(Colors.RED + "Please enter a valid number." + Colors.END)
+        # Player's actions
+        while True:
+            move = self.get_player_move(player, first_move)
+            first_move = None
+            event = self.engine.apply_move(player, move)
+            if event == 'hit':
+                self.display_player_hand(player)
+            elif event == 'bust':
+                self.display_player_hand(player)
+                print(Colors.RED + f"{player.name} busts! Dealer wins." + Colors.END)
+                self.pacer.wait(2)  # Increased delay
+                return event  # End player's turn immediately
+            elif event == 'stand':
+                return event  # Player stands; end their turn
+            elif event == 'no_double':
+                print(Colors.RED + "Insufficient balance to double down." + Colors.END)
+                self.pacer.wait(1.5)  # Increased delay
+                continue  # Prompt for move again
             else:
-                # AI player
-                if 'bet' not in player:
-                    bet = min(100, player['balance']) if player['balance'] >= 100 else player['balance']
-                    player['bet'] = bet
-                    player['balance'] -= bet
-                    print(Colors.CYAN + f"{player['name']} places a bet of ${bet}." + Colors.END)
-                    time.sleep(1.5)  # Increased delay
-
-            # Player's actions
-            while True:
-                move = self.get_player_move(player)
-                if move == 'h':
-                    player['hand'].add_card(self.deck.deal_card())
-                    self.display_player_hand(player)
-                    if player['hand'].is_bust():
-                        print(Colors.RED + f"{player['name']} busts! Dealer wins." + Colors.END)
-                        time.sleep(2)  # Increased delay
-                        break  # End player's turn immediately
-                elif move == 's':
-                    break  # Player stands; end their turn
-                elif move == 'd':
-                    if player['bet'] * 2 > player['balance']:
-                        print(Colors.RED + "Insufficient balance to double down." + Colors.END)
-                        time.sleep(1.5)  # Increased delay
-                        continue  # Prompt for move again
-                    player['bet'] *= 2
-                    player['balance'] -= player['bet'] / 2  # Deduct the additional bet
-                    player['hand'].is_doubled = True
-                    player['hand'].add_card(self.deck.deal_card())
-                    self.display_player_hand(player)
-                    print(Colors.CYAN + f"{player['name']} doubles down and receives one card." + Colors.END)
-                    time.sleep(1.5)  # Increased delay
-                    if player['hand'].is_bust():
-                        print(Colors.RED + f"{player['name']} busts after doubling down! Dealer wins." + Colors.END)
-                        time.sleep(2)  # Increased delay
-                    break  # End player's turn after doubling down
-
-        # Dealer's turn
+                self.display_player_hand(player)
+                print(Colors.CYAN + f"{player.name} doubles down and receives one card." + Colors.END)
+                self.pacer.wait(1.5)  # Increased delay
+                if event == 'double_bust':
+                    print(Colors.RED + f"{player.name} busts after doubling down! Dealer wins." + Colors.END)
+                    self.pacer.wait(2)  # Increased delay
+                return event  # End player's turn after doubling down
+
+    def play_dealer_turn(self):
         # Check if any player hasn't busted
-        if any(not player['hand'].is_bust() for player in self.players):
+        if self.engine.start_dealer_turn():
             self.clear_screen()
             print(Colors.BLUE + "Dealer's Turn:" + Colors.END)
             print("Dealer's Hand:")
             print(self.dealer.render_hand(hide_first_card=False))
-            time.sleep(1.5)  # Increased delay
-            while self.dealer.calculate_value() < 17:
+            self.pacer.wait(1.5)  # Increased delay
+            while self.engine.dealer_should_hit():
                 print(Colors.BLUE + "Dealer hits." + Colors.END)
-                self.dealer.add_card(self.deck.deal_card())
+                self.engine.dealer_hit()
                 print("Dealer's Hand:")
                 print(self.dealer.render_hand(hide_first_card=False))
-                time.sleep(1.5)  # Increased delay
-            if self.dealer.calculate_value() >= 17:
-                print(Colors.BLUE + "Dealer stands." + Colors.END)
-                time.sleep(1.5)  # Increased delay
+                self.pacer.wait(1.5)  # Increased delay
+            print(Colors.BLUE + "Dealer stands." + Colors.END)
+            self.pacer.wait(1.5)  # Increased delay
 
-        dealer_value = self.dealer.calculate_value()
-        dealer_bust = dealer_value > 21
+    def play_round(self):
+        metrics = self.metrics
+        # Initial deal
+        with metrics.time('phase', DEAL_PHASE):
+            self.engine = RoundEngine(self.deck, self.players)
+            self.dealer = self.engine.deal()
+            self.engine.place_ai_bets()
+            first_moves = dict(zip(map(id, self.engine.ai_players), self.engine.first_moves()))
+        if self.engine.reshuffled:
+            metrics.inc('reshuffles')
+        metrics.inc('blackjacks', sum(player.hand.is_blackjack for player in self.players))
 
-        # Display results for each player one at a time
+        # Players' turns
         for player in self.players:
-            self.display_result(player, dealer_value, dealer_bust)
+            with metrics.time('phase', AI_TURN_PHASE if player.is_ai else HUMAN_TURN_PHASE):
+                event = self.play_player_turn(player, first_moves.get(id(player)))
+            if event in ('double', 'double_bust'):
+                metrics.inc('doubles')
 
-        # Check for players who have exceeded $10,000
-        high_winners = [player for player in self.players if player['balance'] > 10000]
-        for player in high_winners:
-            self.handle_high_win(player)
+        # Dealer's turn
+        with metrics.time('phase', DEALER_PHASE):
+            self.play_dealer_turn()
+            dealer_value, dealer_bust = self.engine.finish_dealer_turn()
+
+        # Counted before settlement, which may remove high winners
+        seats = len(self.players)
+
+        # Every write from here on is committed together at the end of the
+        # round; nothing asks for input while they are pending
+        with self.storage.batch():
+            # Display results for each player one at a time
+            with metrics.time('phase', SETTLEMENT_PHASE):
+                results = [self.display_result(player, dealer_value, dealer_bust) for player in self.players]
+            if self.recorder:
+                self.recorder.record_round(self.engine, results)
+
+            # Check for players who have exceeded $10,000
+            high_winners = [player for player in self.players if player.balance > HIGH_WIN_BALANCE]
+            for player in high_winners:
+                with metrics.time('phase', HIGH_WIN_PHASE):
+                    self.handle_high_win(player)
+
+            persisting = metrics.start()
+            # Update saved players with current players' balances
+            self.save_player_balances()
+            self.save_leaderboard()
+        metrics.stop('phase', persisting, PERSISTENCE_PHASE)
+        metrics.inc('rounds')
+        metrics.inc('hands', seats)
 
         # Reset all players' bets for the next round
-        for player in self.players:
-            player.pop('bet', None)
-
-        # Display ASCII Joker card and prompt to play again
-        play_again = self.display_joker_card()
-        return play_again  # Return the choice to the game loop
+        self.engine.finish()
 
     def handle_high_win(self, player):
         # Switch to victory music
@@ -481,10 +881,10 @@ class BlackjackGame:
         ]
         for line in narrative:
             print(Colors.RED + line + Colors.END)
-            time.sleep(2)  # Pause between lines for dramatic effect
+            self.pacer.wait(2)  # Pause between lines for dramatic effect
 
         # Delete the player
-        self.delete_player_by_name(player['name'])
+        self.delete_player_by_name(player.name)
 
         # Stop victory music and return to background music
         self.stop_music()
@@ -492,61 +892,74 @@ class BlackjackGame:
 
         # Inform the player
         print(Colors.YELLOW + "Returning to main menu..." + Colors.END)
-        time.sleep(2)  # Increased delay
+        self.pacer.wait(2)  # Increased delay
 
     def delete_player_by_name(self, player_name):
         # Remove from players list
-        self.players = [player for player in self.players if player['name'] != player_name]
+        self.players = [player for player in self.players if player.name != player_name]
 
         # Remove from saved players
         saved_players = self.load_players()
         if player_name in saved_players:
-            del saved_players[player_name]
-            self.save_players_to_file(saved_players)
+            self.storage.delete_player(player_name)
 
         # Remove from leaderboard
         if player_name in self.leaderboard:
             del self.leaderboard[player_name]
-            self.save_leaderboard()
 
         # If the deleted player was the current player, unset current player
         if self.current_player_name == player_name:
             self.save_current_player(None)
 
         print(Colors.YELLOW + f"Player '{player_name}' has been deleted from the game." + Colors.END)
-        time.sleep(2)  # Increased delay
+        self.pacer.wait(2)  # Increased delay
 
     def update_leaderboard(self, player_name, amount_won):
-        if player_name in self.leaderboard:
-            self.leaderboard[player_name] += amount_won
-        else:
-            self.leaderboard[player_name] = amount_won
-        self.save_leaderboard()
+        # Saved with the rest of the round by save_leaderboard
+        self.leaderboard.add(player_name, amount_won)
 
     def check_balances(self):
-        active_players = [player for player in self.players if player['balance'] > 0]
-        eliminated = [player for player in self.players if player['balance'] <= 0]
-        for player in eliminated:
-            if player.get('is_ai', False):
-                print(Colors.RED + f"{player['name']} (AI) has run out of balance and is removed from the game." + Colors.END)
+        # One pass over the table, so removing many broke seats stays linear
+        active_players = []
+        for player in self.players:
+            if player.balance > 0:
+                active_players.append(player)
+            elif player.is_ai:
+                print(Colors.RED + f"{player.name} (AI) has run out of balance and is removed from the game." + Colors.END)
+                self.pacer.wait(1.5)  # Increased delay
             else:
-                print(Colors.RED + f"{player['name']} has run out of balance and is removed from the game." + Colors.END)
-            self.players.remove(player)
-            time.sleep(1.5)  # Increased delay
+                print(Colors.RED + f"{player.name} has run out of balance and is removed from the game." + Colors.END)
+                self.pacer.wait(1.5)  # Increased delay
+        self.players = active_players
         return len(active_players) > 0
 
     def show_leaderboard(self):
-        self.clear_screen()
-        print(Colors.HEADER + "\n=== Leaderboard ===" + Colors.END)
-        if not self.leaderboard:
-            print("No entries yet.")
-        else:
-            # Sort leaderboard
-            sorted_leaderboard = sorted(self.leaderboard.items(), key=lambda x: x[1], reverse=True)
-            for idx, (player, amount) in enumerate(sorted_leaderboard, start=1):
-                print(f"{idx}. {player} - ${amount}")
-        print()
-        input("Press Enter to return to the main menu...")
+        page = 1
+        pages = self.leaderboard.page_count(LEADERBOARD_PAGE_SIZE)
+        while True:
+            self.clear_screen()
+            print(Colors.HEADER + "\n=== Leaderboard ===" + Colors.END)
+            if not self.leaderboard:
+                print("No entries yet.")
+            else:
+                for idx, player, amount in self.leaderboard.page(page, LEADERBOARD_PAGE_SIZE):
+                    print(f"{idx}. {player} - ${amount}")
+                if pages > 1:
+                    print(f"\nPage {page} of {pages}")
+                rank = self.leaderboard.rank(self.current_player_name)
+                if rank:
+                    print(f"{self.current_player_name} is ranked #{rank}.")
+            print()
+            if pages == 1:
+                self.ask("Press Enter to return to the main menu...")
+                return
+            choice = self.ask("Press Enter to return to the main menu, or n/p for the next/previous page: ").strip().lower()
+            if choice == 'n':
+                page = min(page + 1, pages)
+            elif choice == 'p':
+                page = max(page - 1, 1)
+            else:
+                return
 
     def select_players(self):
         while True:
@@ -560,7 +973,7 @@ class BlackjackGame:
             print("5. View Leaderboard")
             print("6. Start Game")
             print("7. Exit")
-            choice = input("Choose an option (1-7): ").strip()
+            choice = self.ask("Choose an option (1-7): ").strip()
             if choice == '1':
                 self.select_existing_player()
             elif choice == '2':
@@ -577,42 +990,40 @@ class BlackjackGame:
                     players_data = self.load_players()
                     if self.current_player_name in players_data:
                         # Update the player's balance in self.players list
-                        self.players = [p for p in self.players if p.get('is_ai', False)]
-                        self.players.append({
-                            'name': self.current_player_name,
-                            'balance': players_data[self.current_player_name]['balance'],
-                            'hand': Hand(),
-                            'is_ai': False
-                        })
+                        self.players = [p for p in self.players if p.is_ai]
+                        self.players.append(Seat(self.current_player_name, players_data[self.current_player_name]['balance']))
                         return  # Proceed to start the game
                     else:
                         print(Colors.RED + "Current player not found. Please select or create a new player." + Colors.END)
-                        time.sleep(2)  # Increased delay
+                        self.pacer.wait(2)  # Increased delay
                 else:
                     print(Colors.RED + "No active human player found. Please select or create a player." + Colors.END)
-                    time.sleep(2)  # Increased delay
+                    self.pacer.wait(2)  # Increased delay
             elif choice == '7':
                 print(Colors.HEADER + "Thanks for playing! Goodbye." + Colors.END)
-                self.save_leaderboard()
-                # Update players.json with current players' balances
-                players_data = self.load_players()
-                for player in self.players:
-                    if not player.get('is_ai', False):
-                        players_data[player['name']]['balance'] = player['balance']
-                self.save_players_to_file(players_data)
-                self.save_current_player(None)
+                print(f"Table seed: {self.seed}")
+                with self.storage.batch():
+                    # Update saved players with current players' balances
+                    self.save_player_balances()
+                    self.save_leaderboard()
+                    self.save_current_player(None)
+                self.storage.close()
+                if self.recorder:
+                    self.recorder.close()
+                self.export_metrics()
                 self.stop_music()  # Stop any playing music
-                time.sleep(2)  # Increased delay
+                self.pacer.wait(2)  # Increased delay
+                self.pacer.flush()
                 sys.exit()
             else:
                 print(Colors.RED + "Invalid choice. Please select a valid option." + Colors.END)
-                time.sleep(1.5)  # Increased delay
+                self.pacer.wait(1.5)  # Increased delay
 
     def select_existing_player(self):
         saved_players = self.load_players()
         if not saved_players:
             print(Colors.RED + "No saved players found. Please create a new player." + Colors.END)
-            time.sleep(2)  # Increased delay
+            self.pacer.wait(2)  # Increased delay
             return
         player_names = list(saved_players.keys())
         self.clear_screen()
@@ -621,13 +1032,13 @@ class BlackjackGame:
             print(f"{idx}. {name} (Balance: ${saved_players[name]['balance']})")
         while True:
             try:
-                selection = int(input(f"Select a player to activate (1-{len(player_names)}): "))
+                selection = int(self.ask(f"Select a player to activate (1-{len(player_names)}): "))
                 if 1 <= selection <= len(player_names):
                     selected_name = player_names[selection - 1]
                     # Set as current player
                     self.save_current_player(selected_name)
                     print(Colors.GREEN + f"Player '{selected_name}' is now the active player." + Colors.END)
-                    time.sleep(1.5)  # Increased delay
+                    self.pacer.wait(1.5)  # Increased delay
                     return
                 else:
                     print(Colors.RED + "Invalid selection." + Colors.END)
@@ -639,62 +1050,73 @@ class BlackjackGame:
         while True:
             self.clear_screen()
             print(Colors.HEADER + "=== Create New Player ===" + Colors.END)
-            name = input("Enter a name for the new player: ").strip()
+            name = self.ask("Enter a name for the new player: ").strip()
             if not name:
                 print(Colors.RED + "Name cannot be empty." + Colors.END)
-                time.sleep(1.5)  # Increased delay
+                self.pacer.wait(1.5)  # Increased delay
                 continue
             if name in saved_players:
                 print(Colors.RED + "Player with this name already exists." + Colors.END)
-                time.sleep(1.5)  # Increased delay
+                self.pacer.wait(1.5)  # Increased delay
                 continue
-            # Add new player to saved_players
-            saved_players[name] = {'balance': 1000}
-            self.save_players_to_file(saved_players)
-            # Set as current player
-            self.save_current_player(name)
+            # Add new player to saved players and set as current player
+            with self.storage.batch():
+                self.storage.save_player(name, STARTING_BALANCE)
+                self.save_current_player(name)
             print(Colors.GREEN + f"Player '{name}' created and set as the active player with a balance of $1000." + Colors.END)
-            time.sleep(2)  # Increased delay
+            self.pacer.wait(2)  # Increased delay
             return
 
     def add_ai_players(self):
+        # One seat is kept for the human player
+        room = max_seats(self.deck.num_decks) - 1 - sum(player.is_ai for player in self.players)
+        if room < 1:
+            self.clear_screen()
+            print(Colors.RED + "The table is full." + Colors.END)
+            self.pacer.wait(1.5)
+            return
         while True:
             self.clear_screen()
             print(Colors.HEADER + "=== Add AI Players ===" + Colors.END)
             try:
-                num_ai = int(input("Enter the number of AI players to add (1-5): "))
-                if 1 <= num_ai <= 5:
+                num_ai = int(self.ask(f"Enter the number of AI players to add (1-{room}): "))
+                if 1 <= num_ai <= room:
                     break
                 else:
-                    print(Colors.RED + "Please enter a number between 1 and 5." + Colors.END)
-                    time.sleep(1.5)  # Increased delay
+                    print(Colors.RED + f"Please enter a number between 1 and {room}." + Colors.END)
+                    self.pacer.wait(1.5)  # Increased delay
             except ValueError:
                 print(Colors.RED + "Please enter a valid number." + Colors.END)
-                time.sleep(1.5)  # Increased delay
+                self.pacer.wait(1.5)  # Increased delay
+        policy = self.choose_ai_policy()
         for _ in range(num_ai):
-            if not self.available_ai_names:
-                print(Colors.RED + "No more unique AI names available. Cannot add more AI players." + Colors.END)
-                time.sleep(2)  # Increased delay
-                break
             self.ai_player_count += 1
-            ai_name = random.choice(self.available_ai_names)
-            self.available_ai_names.remove(ai_name)
-            self.players.append({
-                'name': ai_name,
-                'balance': 1000,  # AI players start with a balance of $1000
-                'hand': Hand(),
-                'is_ai': True
-            })
-            print(Colors.CYAN + f"AI Player '{ai_name}' added to the game with a balance of $1000." + Colors.END)
-            time.sleep(0.5)
+            if self.available_ai_names:
+                ai_name = self.rng.choice(self.available_ai_names)
+                self.available_ai_names.remove(ai_name)
+            else:
+                ai_name = next(self.extra_ai_names)
+            self.players.append(Seat(ai_name, is_ai=True, policy=policy))
+            if num_ai <= AI_ANNOUNCED:
+                print(Colors.CYAN + f"AI Player '{ai_name}' ({policy.name}) added to the game with a balance of $1000." + Colors.END)
+                self.pacer.wait(0.5)
         print(Colors.GREEN + f"Added {num_ai} AI player(s)." + Colors.END)
-        time.sleep(2)  # Increased delay
+        self.pacer.wait(2)  # Increased delay
+
+    def choose_ai_policy(self):
+        # Every AI player added together plays the same policy
+        names = sorted(POLICIES)
+        while True:
+            name = self.ask(f"Choose their policy ({', '.join(names)}) [{DEFAULT_POLICY}]: ").strip().lower() or DEFAULT_POLICY
+            if name in POLICIES:
+                return get_policy(name, self.deck.num_decks)
+            print(Colors.RED + f"Please enter one of: {', '.join(names)}." + Colors.END)
 
     def delete_player(self):
         saved_players = self.load_players()
         if not saved_players:
             print(Colors.RED + "No saved human players to delete." + Colors.END)
-            time.sleep(2)  # Increased delay
+            self.pacer.wait(2)  # Increased delay
             return
         player_names = list(saved_players.keys())
         self.clear_screen()
@@ -703,35 +1125,65 @@ class BlackjackGame:
             print(f"{idx}. {name} (Balance: ${saved_players[name]['balance']})")
         while True:
             try:
-                selection = int(input(f"Select a player to delete (1-{len(player_names)}): "))
+                selection = int(self.ask(f"Select a player to delete (1-{len(player_names)}): "))
                 if 1 <= selection <= len(player_names):
                     selected_name = player_names[selection - 1]
-                    confirm = input(f"Are you sure you want to delete '{selected_name}'? (y/n): ").strip().lower()
+                    confirm = self.ask(f"Are you sure you want to delete '{selected_name}'? (y/n): ").strip().lower()
                     if confirm == 'y':
-                        # Remove from saved_players
-                        del saved_players[selected_name]
-                        self.save_players_to_file(saved_players)
+                        # Remove from saved players
+                        self.storage.delete_player(selected_name)
                         # If the deleted player was the current player, unset current player
                         if self.current_player_name == selected_name:
                             self.save_current_player(None)
                             print(Colors.YELLOW + f"Deleted current active player '{selected_name}'. No active player now." + Colors.END)
                         else:
                             print(Colors.GREEN + f"Player '{selected_name}' deleted." + Colors.END)
-                        time.sleep(2)  # Increased delay
+                        self.pacer.wait(2)  # Increased delay
                         return
                     else:
                         print("Deletion canceled.")
-                        time.sleep(1.5)  # Increased delay
+                        self.pacer.wait(1.5)  # Increased delay
                         return
                 else:
                     print(Colors.RED + "Invalid selection." + Colors.END)
             except ValueError:
                 print(Colors.RED + "Please enter a valid number." + Colors.END)
 
+    def export_metrics(self):
+        self.metrics.set('bytes_written', self.storage.bytes_written, (('target', 'storage'),))
+        if self.recorder:
+            self.metrics.set('bytes_written', self.recorder.bytes_written, (('target', 'history'),))
+        if self.metrics_path:
+            self.metrics.write(self.metrics_path)
+
+    def show_startup_report(self):
+        self.startup.report()
+        self.startup = None  # Only shown once
+        self.ask("Press Enter to continue...")
+
     def start_game(self):
+        # Delays are taken just before the next thing is written to the screen.
+        # On a terminal, screens are drawn by a FrameRenderer.
+        stdout = sys.stdout
+        if sys.stdin.isatty() and stdout.isatty():
+            from screen import FrameRenderer
+            self.screen = FrameRenderer(stdout)
+        sys.stdout = PacedStream(self.screen or stdout, self.pacer)
+        try:
+            self.run_game_loop()
+        finally:
+            sys.stdout.flush()
+            sys.stdout = stdout
+            self.screen = None
+
+    def run_game_loop(self):
         while True:
-            self.clear_screen()
-            print(Colors.HEADER + "Welcome to Enhanced Blackjack with AI Players!" + Colors.END)
+            with startup_phase(self.startup, 'first frame'):
+                self.clear_screen()
+                print(Colors.HEADER + "Welcome to Enhanced Blackjack with AI Players!" + Colors.END)
+                sys.stdout.flush()
+            if self.startup:
+                self.show_startup_report()
             self.show_leaderboard()
             self.select_players()
             # At this point, players list has the current human player and any AI players
@@ -741,20 +1193,17 @@ class BlackjackGame:
                 print(Colors.HEADER + "=== Starting a New Round ===" + Colors.END)
                 if not self.check_balances():
                     print(Colors.YELLOW + "No players left with balance. Game over." + Colors.END)
-                    time.sleep(2)  # Increased delay
+                    self.pacer.wait(2)  # Increased delay
                     break
-                play_again = self.play_round()
-                # Update players.json with current players' balances
-                players_data = self.load_players()
-                for player in self.players:
-                    if not player.get('is_ai', False):
-                        players_data[player['name']]['balance'] = player['balance']
-                self.save_players_to_file(players_data)
-                self.save_current_player(self.current_player_name)
-                self.save_leaderboard()
+                self.play_round()
+                self.export_metrics()
+                if self.profiler:
+                    self.profiler.round_done()
+                # Display ASCII Joker card and prompt to play again
+                play_again = self.display_joker_card()
                 if not self.check_balances():
                     print(Colors.YELLOW + "No players left with balance. Game over." + Colors.END)
-                    time.sleep(2)  # Increased delay
+                    self.pacer.wait(2)  # Increased delay
                     break
                 if not play_again:
                     # User chose not to play again; return to main menu
@@ -763,7 +1212,7 @@ class BlackjackGame:
 
             # After game over or choosing not to play again, return to main menu
             print(Colors.YELLOW + "Returning to main menu..." + Colors.END)
-            time.sleep(2)  # Increased delay
+            self.pacer.wait(2)  # Increased delay
 
     def display_final_leaderboard(self):
         self.clear_screen()
@@ -771,14 +1220,245 @@ class BlackjackGame:
         if not self.leaderboard:
             print("No entries yet.")
         else:
-            # Sort leaderboard
-            sorted_leaderboard = sorted(self.leaderboard.items(), key=lambda x: x[1], reverse=True)
-            for idx, (player, amount) in enumerate(sorted_leaderboard, start=1):
+            for idx, (player, amount) in enumerate(self.leaderboard.top(), start=1):
                 print(f"{idx}. {player} - ${amount}")
         print()
-        input("Press Enter to return to the main menu...")
+        self.ask("Press Enter to return to the main menu...")
+
+# Play AI-only rounds with no terminal I/O, delays or file writes.
+# Broke seats buy back in and high winners are reset, so the table never empties.
+COUNT_BUCKET_LIMIT = 6  # True counts beyond +/-6 are grouped with +/-6
+
+def count_bucket(true_count):
+    return max(-COUNT_BUCKET_LIMIT, min(COUNT_BUCKET_LIMIT, int(true_count // 1)))
+
+def new_headless_stats(players):
+    return {
+        'rounds': 0, 'hands': 0, 'wins': 0, 'losses': 0, 'pushes': 0,
+        'busts': 0, 'blackjacks': 0, 'doubles': 0, 'rebuys': 0, 'high_wins': 0, 'reshuffles': 0, 'bytes_written': 0,
+        'net': {player.name: 0 for player in players},
+        'by_count': {},  # True count at the deal -> [hands, wagered, net]
+    }
+
+# One AI-only round with no output, adding its results to stats and leaderboard
+def play_headless_round(deck, players, stats, leaderboard, recorder=None):
+    net = stats['net']
+    engine = RoundEngine(deck, players)
+    engine.deal()
+    engine.place_ai_bets()
+    for player, move in zip(players, engine.first_moves()):
+        if player.hand.is_blackjack:
+            stats['blackjacks'] += 1
+        event = engine.play_ai_turn(player, move)
+        if event in ('double', 'double_bust'):
+            stats['doubles'] += 1
+    dealer_value, dealer_bust = engine.play_dealer()
+    results = []
+    wagered = round_net = 0
+    for player in players:
+        bet = player.bet
+        outcome, winnings = engine.settle(player, dealer_value, dealer_bust)
+        results.append((outcome, winnings))
+        net[player.name] += winnings - bet
+        wagered += bet
+        round_net += winnings - bet
+        if outcome in ('dealer_bust', 'win'):
+            stats['wins'] += 1
+            leaderboard[player.name] = leaderboard.get(player.name, 0) + winnings - bet
+        elif outcome == 'push':
+            stats['pushes'] += 1
+        else:
+            stats['losses'] += 1
+            if outcome == 'bust':
+                stats['busts'] += 1
+    by_count = stats['by_count'].setdefault(count_bucket(engine.true_count), [0, 0, 0])
+    by_count[0] += len(players)
+    by_count[1] += wagered
+    by_count[2] += round_net
+    if recorder:
+        recorder.record_round(engine, results)
+    engine.finish()
+    for player in players:
+        if player.balance > HIGH_WIN_BALANCE:
+            stats['high_wins'] += 1
+            leaderboard.pop(player.name, None)
+            player.balance = STARTING_BALANCE
+        elif player.balance <= 0:
+            stats['rebuys'] += 1
+            player.balance = STARTING_BALANCE
+    stats['rounds'] += 1
+    stats['hands'] += len(players)
+
+def run_headless(rounds, num_ai=5, num_decks=DEFAULT_NUM_DECKS, penetration=DEFAULT_PENETRATION, seed=None,
+                 startup=None, record=None, policies=None, profiler=None):
+    # policies names each seat's policy in turn (default: all DEFAULT_POLICY)
+    if num_ai > max_seats(num_decks):
+        raise ValueError(f"A {num_decks}-deck shoe can deal at most {max_seats(num_decks)} seats.")
+    if seed is None:
+        seed = new_seed()
+    with startup_phase(startup, 'deck'):
+        deck = Deck(num_decks, penetration, rng=random.Random(seed))
+        seat_policy = seat_policies(policies, num_ai, num_decks)
+    players = [Seat(name, is_ai=True, policy=policy) for name, policy in zip(ai_names(), seat_policy)]
+    leaderboard = {}
+    stats = new_headless_stats(players)
+    # Headless runs leave flushing to the file buffer, so recording stays cheap
+    recorder = None
+    if record:
+        from recorder import HandRecorder
+        recorder = HandRecorder(record, seed, num_decks, penetration, headless=True, sync=False)
+    for _ in range(rounds):
+        play_headless_round(deck, players, stats, leaderboard, recorder)
+        if profiler:
+            profiler.round_done()
+    if recorder:
+        recorder.close()
+        stats['bytes_written'] = recorder.bytes_written
+    stats['reshuffles'] = deck.shuffles - 1
+    stats['balances'] = {player.name: player.balance for player in players}
+    stats['leaderboard'] = leaderboard
+    stats['policies'] = {player.name: player.policy.name for player in players}
+    stats['seed'] = seed
+    return stats
+
+def headless_metrics(stats, elapsed):
+    # Headless rounds are not timed phase by phase, which would slow the loop;
+    # their counters come from the run's stats
+    from metrics import Metrics
+    metrics = Metrics()
+    for counter in ('rounds', 'hands', 'busts', 'blackjacks', 'doubles', 'reshuffles'):
+        metrics.set(counter, stats[counter])
+    metrics.set('bytes_written', stats['bytes_written'], (('target', 'history'),))
+    metrics.observe('headless_run', elapsed)
+    return metrics
+
+def print_headless_report(stats, elapsed):
+    rate = stats['rounds'] / elapsed if elapsed > 0 else float('inf')
+    print(Colors.HEADER + "=== Headless Run ===" + Colors.END)
+    print(f"Rounds: {stats['rounds']}  Hands: {stats['hands']}  Time: {elapsed:.2f}s  ({rate:,.0f} rounds/sec)")
+    print(f"Wins: {stats['wins']}  Losses: {stats['losses']}  Pushes: {stats['pushes']}  "
+          f"Busts: {stats['busts']}  Blackjacks: {stats['blackjacks']}  Doubles: {stats['doubles']}")
+    print(f"Rebuys: {stats['rebuys']}  High wins: {stats['high_wins']}")
+    if stats.get('by_count'):
+        print("By true count at the deal:")
+        for bucket, (hands, wagered, net) in sorted(stats['by_count'].items()):
+            edge = net / wagered * 100 if wagered else 0.0
+            print(f"  {bucket:+3d}: {hands:>10,} hands  wagered ${wagered:>14,.0f}  net ${net:>12,.2f}  ({edge:+.2f}%)")
+    if 'seed' in stats:
+        print(f"Seed: {stats['seed']}")
+    balances = stats.get('balances', {})
+    policies = stats.get('policies', {})
+    for name, amount in stats['net'].items():
+        label = f"{name} ({policies[name]})" if name in policies else name
+        if name in balances:
+            print(f"{label} - net ${amount:,.2f}, balance ${balances[name]:,.2f}")
+        else:
+            print(f"{label} - net ${amount:,.2f}")
+
+def parse_args(argv=None):
+    import argparse
+    from storage import DATABASE_FILE
+    parser = argparse.ArgumentParser(description="Enhanced Blackjack with AI Players")
+    parser.add_argument('--headless', action='store_true',
+                        help="play AI-only rounds at full speed with no terminal UI")
+    parser.add_argument('--rounds', type=int, default=1000,
+                        help="number of rounds to play in headless mode (default: 1000)")
+    parser.add_argument('--ai-players', type=int, default=5, metavar='N',
+                        help="number of AI seats in headless mode (default: 5)")
+    parser.add_argument('--policy', nargs='+', choices=sorted(POLICIES), default=[DEFAULT_POLICY], metavar='NAME',
+                        help=f"AI policy for the headless seats, handed out in turn, e.g. --policy counter basic "
+                             f"({', '.join(sorted(POLICIES))}; default: {DEFAULT_POLICY})")
+    parser.add_argument('--decks', type=int, default=DEFAULT_NUM_DECKS, choices=range(MIN_DECKS, MAX_DECKS + 1),
+                        metavar=f"{MIN_DECKS}-{MAX_DECKS}", help=f"number of decks in the shoe (default: {DEFAULT_NUM_DECKS})")
+    parser.add_argument('--penetration', type=float, default=DEFAULT_PENETRATION,
+                        help=f"fraction of the shoe dealt before reshuffling (default: {DEFAULT_PENETRATION})")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="game speed: 1 = normal pauses, 0.25 = fast, 0 = no pauses (default: 1)")
+    parser.add_argument('--no-audio', action='store_true',
+                        help="never start pygame or the audio mixer")
+    parser.add_argument('--storage', choices=('json', 'sqlite'), default='json',
+                        help="where players and the leaderboard are saved (default: json)")
+    parser.add_argument('--db', default=DATABASE_FILE,
+                        help=f"SQLite database file for --storage sqlite (default: {DATABASE_FILE})")
+    parser.add_argument('--migrate', action='store_true',
+                        help="copy players.json, current_player.json and leaderboard.json into the SQLite database and exit")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="seed for the table's shuffles (default: a new random seed, shown at the end); "
+                             "with --workers, the master seed for all workers")
+    parser.add_argument('--workers', type=int, default=None, nargs='?', const=0,
+                        help="split headless rounds across this many processes (no value: one per core)")
+    parser.add_argument('--record', metavar='PATH',
+                        help="append every round to a binary hand history (with --workers, one file per worker: PATH.0, PATH.1, ...)")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="export round counters and phase timings to PATH: JSON if it ends in .json, "
+                             "Prometheus text otherwise (written after every round, or at the end of a headless run)")
+    parser.add_argument('--profile', choices=('full', 'sample'), nargs='?', const='full',
+                        help="profile the game or headless run: 'full' (the default) uses cProfile and tracemalloc, "
+                             "'sample' is a low-overhead stack sampler")
+    parser.add_argument('--profile-every', type=int, default=1000, metavar='N',
+                        help="rounds between profile checkpoints (default: 1000)")
+    parser.add_argument('--profile-output', default='blackjack-profile', metavar='PREFIX',
+                        help="profile report file prefix: PREFIX.txt, and PREFIX.prof in full mode (default: blackjack-profile)")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="show how long each startup phase took (imports, storage, audio, deck, first frame)")
+    args = parser.parse_args(argv)
+    if not 1 <= args.ai_players <= max_seats(args.decks):
+        parser.error(f"--ai-players must be between 1 and {max_seats(args.decks)} for a {args.decks}-deck shoe")
+    # Hand histories store the seed as an unsigned 64-bit number
+    if args.seed is not None and not 0 <= args.seed < 2 ** 64:
+        parser.error("--seed must be between 0 and 2**64 - 1")
+    return args
 
 # Run the game
 if __name__ == "__main__":
-    game = BlackjackGame()
-    game.start_game()
+    args = parse_args()
+    profiler = None
+    if args.profile:
+        if args.headless and args.workers is not None:
+            sys.exit("--profile profiles this process only, so it cannot be used with --workers.")
+        from profiling import open_profiler
+        profiler = open_profiler(args.profile, args.profile_output, args.profile_every)
+    if args.headless and args.workers is not None:
+        from parallel import run_parallel
+        seed = new_seed() if args.seed is None else args.seed
+        start = time.perf_counter()
+        stats = run_parallel(args.rounds, args.ai_players, args.decks, args.penetration, seed, args.workers or None,
+                             args.record, args.policy)
+        elapsed = time.perf_counter() - start
+        print_headless_report(stats, elapsed)
+        print(f"Workers: {stats['workers']}  Master seed: {seed}")
+        if args.metrics:
+            headless_metrics(stats, elapsed).write(args.metrics)
+    elif args.headless:
+        startup = StartupTimer() if args.startup_report else None
+        start = time.perf_counter()
+        run_args = (args.rounds, args.ai_players, args.decks, args.penetration, args.seed, startup, args.record,
+                    args.policy, profiler)
+        stats = profiler.run(run_headless, *run_args) if profiler else run_headless(*run_args)
+        elapsed = time.perf_counter() - start
+        print_headless_report(stats, elapsed)
+        if startup:
+            startup.report()
+        if args.metrics:
+            headless_metrics(stats, elapsed).write(args.metrics)
+    elif args.migrate:
+        from storage import migrate_json_to_sqlite
+        players, entries = migrate_json_to_sqlite(args.db, warn=print_error)
+        print(Colors.GREEN + f"Migrated {players} player(s) and {entries} leaderboard entries into '{args.db}'." + Colors.END)
+    else:
+        startup = StartupTimer() if args.startup_report else None
+        with startup_phase(startup, 'storage'):
+            from storage import open_storage
+            storage = open_storage(args.storage, args.db, warn=print_error)
+        audio = NullAudio() if args.no_audio else None
+        seed = new_seed() if args.seed is None else args.seed
+        recorder = None
+        if args.record:
+            from recorder import HandRecorder
+            recorder = HandRecorder(args.record, seed, args.decks, args.penetration)
+        game = BlackjackGame(args.decks, args.penetration, storage, Pacer(args.speed), audio, startup, recorder, seed,
+                             args.metrics, profiler)
+        if profiler:
+            profiler.run(game.start_game)
+        else:
+            game.start_game()
@@ -0,0 +1,266 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from BJ import CARD_VALUES, Colors
+from recorder import (
+    CONTINUATION_CARDS, DOUBLED, MAGIC, MAX_CARDS, OUTCOME_CODES, OUTCOME_MASK, RECORD_SIZE, VERSION, load_names,
+)
+
+# Queries over recorded hand histories (see recorder.py) that never load a
+# whole history into memory. Each file is memory-mapped as an array of
+# 32-byte records and read in chunks of CHUNK_RECORDS; every chunk is split
+# into round and seat records and added to the totals with vectorized NumPy
+# passes, so memory stays flat however large the history is. All the
+# questions are answered from the same single pass.
+#
+#   upcards  hands, win/push/loss rates and return per dollar by dealer upcard
+#   hits     how often a hit busts, by the hand's total before the hit
+#   players  each player's net result and leaderboard gains (the amounts the
+#            game passes to update_leaderboard), overall and over the history
+
+CHUNK_RECORDS = 1 << 20  # 32 MiB of records per pass
+DEFAULT_PERIODS = 10
+MAX_HAND_TOTAL = 31  # Largest total a hand can reach (20 plus a ten)
+
+# The recorder's struct layouts as NumPy record types
+HEADER_DTYPE = np.dtype([('kind', 'S1'), ('magic', 'S3'), ('version', 'u1'), ('flags', 'u1'), ('seed', '<u8'),
+                         ('decks', 'u1'), ('pad', 'V1'), ('penetration', '<f4'), ('rest', 'V12')])
+ROUND_DTYPE = np.dtype([('kind', 'S1'), ('pad', 'V1'), ('dealer_cards', 'u1'), ('flags', 'u1'),
+                        ('round', '<u4'), ('shuffles', '<u4'), ('position', '<u2'), ('cards', 'u1', 16),
+                        ('count', '<i2')])
+SEAT_DTYPE = np.dtype([('kind', 'S1'), ('outcome', 'u1'), ('cards', 'u1'), ('policy', 'u1'), ('name', '<u4'),
+                       ('bet', '<u4'), ('payout', '<u4'), ('codes', 'u1', 16)])
+assert HEADER_DTYPE.itemsize == ROUND_DTYPE.itemsize == SEAT_DTYPE.itemsize == RECORD_SIZE
+
+UPCARD_OFFSET = ROUND_DTYPE.fields['cards'][1]  # The dealer's first card is the upcard
+
+# Card code -> value counting an ace as 1, and whether it is an ace
+HARD_VALUES = np.array([1 if value == 11 else value for value in CARD_VALUES], dtype=np.int16)
+IS_ACE = np.array([value == 11 for value in CARD_VALUES])
+UPCARD_VALUES = np.array(CARD_VALUES, dtype=np.int64)
+
+WINS = np.array([OUTCOME_CODES['dealer_bust'], OUTCOME_CODES['win']])
+OUTCOME_COUNT = len(OUTCOME_CODES)
+
+
+def map_chunks(path, chunk_records=CHUNK_RECORDS):
+    # Yield (first record, records) for each chunk of the history, as a
+    # read-only (records, 32) array of bytes. Every chunk is a map of its own,
+    # unmapped once the next one is taken, so pages already read are let go.
+    # A continuation record always stays in the chunk of the hand it continues.
+    total = os.path.getsize(path) // RECORD_SIZE  # A torn last record is left out
+    if not total:
+        raise ValueError(f"'{path}' holds no records.")
+    with open(path, 'rb') as f:
+        start = 0
+        while start < total:
+            stop = min(start + chunk_records, total)
+            f.seek(stop * RECORD_SIZE)
+            if stop < total and f.read(1) == b'C':
+                stop += 1
+            chunk = np.memmap(path, dtype=np.uint8, mode='r', offset=start * RECORD_SIZE,
+                              shape=(stop - start, RECORD_SIZE))
+            yield start, chunk.view(np.ndarray)  # Plain indexing; memmap's own is slower
+            start = stop
+
+
+REPORT_NAMES = ('upcards', 'hits', 'players')
+
+
+class HistoryTotals:
+    def __init__(self, periods=DEFAULT_PERIODS, reports=REPORT_NAMES):
+        self.periods = periods
+        self.reports = reports  # Only these are added up
+        self.rounds = 0
+        self.hands = 0
+        self.sessions = 0
+        self.upcard_outcomes = np.zeros((12, OUTCOME_COUNT), dtype=np.int64)  # [upcard value, outcome]
+        self.upcard_bets = np.zeros(12, dtype=np.int64)  # Cents
+        self.upcard_returns = np.zeros(12, dtype=np.int64)
+        self.hits = np.zeros(MAX_HAND_TOTAL + 1, dtype=np.int64)  # [total before the hit]
+        self.hit_busts = np.zeros(MAX_HAND_TOTAL + 1, dtype=np.int64)
+        self.net = {}  # name -> cents per period
+        self.leaderboard = {}  # name -> cents
+
+    def add_file(self, path, chunk_records=CHUNK_RECORDS):
+        names, _ = load_names(path)
+        total = os.path.getsize(path) // RECORD_SIZE
+        upcard = -1  # Upcard code of the round a chunk starts in
+        for start, chunk in map_chunks(path, chunk_records):
+            upcard = self.add_chunk(path, chunk, start, total, names, upcard)
+            del chunk
+
+    def add_chunk(self, path, chunk, start, total, names, upcard):
+        kinds = chunk[:, 0]
+        headers = kinds == ord('H')
+        if headers.any():
+            self.check_headers(path, np.ascontiguousarray(chunk[headers]).view(HEADER_DTYPE).ravel())
+        is_round = kinds == ord('R')
+        is_seat = kinds == ord('S')
+        known = headers | is_round | is_seat | (kinds == ord('C'))
+        if not known.all():
+            offset = (start + int(np.argmin(known))) * RECORD_SIZE
+            raise ValueError(f"'{path}' has an unknown record at byte {offset}.")
+        self.rounds += int(is_round.sum())
+
+        # Each seat's upcard is the first dealer card of the last round record before it
+        index = np.arange(len(chunk))
+        last_round = np.maximum.accumulate(np.where(is_round, index, -1))
+        upcards = np.where(last_round >= 0, chunk[np.maximum(last_round, 0), UPCARD_OFFSET].astype(np.int16), upcard)
+        next_upcard = int(upcards[-1])
+        seat_index = np.flatnonzero(is_seat)
+        if not len(seat_index):
+            return next_upcard
+        if (upcards[seat_index] < 0).any():
+            raise ValueError(f"'{path}' has a seat record before any round record.")
+        seats = np.ascontiguousarray(chunk[seat_index]).view(SEAT_DTYPE).ravel()
+        codes = self.seat_codes(path, chunk, seats, seat_index)
+        self.hands += len(seats)
+        if 'upcards' in self.reports:
+            self.add_upcards(seats, UPCARD_VALUES[upcards[seat_index]])
+        if 'hits' in self.reports:
+            self.add_hits(seats, codes)
+        if 'players' in self.reports:
+            self.add_players(seats, names, (start + seat_index) * self.periods // total)
+        return next_upcard
+
+    def seat_codes(self, path, chunk, seats, seat_index):
+        # Every seat's cards; hands longer than MAX_CARDS take the rest from
+        # the continuation record that follows them
+        codes = seats['codes']
+        long_hands = np.flatnonzero(seats['cards'] > MAX_CARDS)
+        if not len(long_hands):
+            return codes
+        continuations = seat_index[long_hands] + 1
+        if (continuations >= len(chunk)).any() or (chunk[continuations.clip(max=len(chunk) - 1), 0] != ord('C')).any():
+            raise ValueError(f"'{path}' is missing the rest of a hand.")
+        codes = np.concatenate([codes, np.zeros((len(seats), CONTINUATION_CARDS), dtype=np.uint8)], axis=1)
+        codes[long_hands, MAX_CARDS:] = chunk[continuations, 1:]
+        return codes
+
+    def check_headers(self, path, headers):
+        if (headers['magic'] != MAGIC).any() or (headers['version'] != VERSION).any():
+            raise ValueError(f"'{path}' is not a version {VERSION} hand history.")
+        self.sessions += len(headers)
+
+    def add_upcards(self, seats, upcards):
+        outcomes = (seats['outcome'] & OUTCOME_MASK).astype(np.int64)
+        self.upcard_outcomes += np.bincount(upcards * OUTCOME_COUNT + outcomes,
+                                            minlength=12 * OUTCOME_COUNT).reshape(12, OUTCOME_COUNT)
+        self.upcard_bets += np.bincount(upcards, weights=seats['bet'], minlength=12).astype(np.int64)
+        self.upcard_returns += np.bincount(upcards, weights=seats['payout'], minlength=12).astype(np.int64)
+
+    def add_hits(self, seats, codes):
+        # Walk the hands a card at a time from the third card on, keeping
+        # only the hands that drew that card, so the work follows the cards
+        # actually dealt. The last card of a doubled hand is not a hit.
+        drew = seats['cards'] > 2
+        seats = seats[drew]
+        codes = codes[drew]
+        counts = seats['cards']
+        hits_end = counts - (seats['outcome'] >= DOUBLED)  # Cards before this one were hits
+        hard = HARD_VALUES[codes[:, 0]] + HARD_VALUES[codes[:, 1]]
+        soft = IS_ACE[codes[:, 0]] | IS_ACE[codes[:, 1]]
+        for card in range(2, int(counts.max(initial=0))):
+            drew = counts > card
+            if not drew.all():
+                codes, counts, hits_end, hard, soft = codes[drew], counts[drew], hits_end[drew], hard[drew], soft[drew]
+            before = np.where(soft & (hard <= 11), hard + 10, hard)
+            hard = hard + HARD_VALUES[codes[:, card]]
+            soft = soft | IS_ACE[codes[:, card]]
+            hit = hits_end > card
+            before = before[hit]
+            self.hits += np.bincount(before, minlength=MAX_HAND_TOTAL + 1)
+            self.hit_busts += np.bincount(before[hard[hit] > 21], minlength=MAX_HAND_TOTAL + 1)
+
+    def add_players(self, seats, names, periods):
+        gains = seats['payout'].astype(np.int64) - seats['bet']
+        name_ids = seats['name'].astype(np.int64)
+        size = int(name_ids.max()) + 1
+        net = np.bincount(name_ids * self.periods + periods, weights=gains,
+                          minlength=size * self.periods).reshape(size, self.periods)
+        outcomes = seats['outcome'] & OUTCOME_MASK
+        won = (outcomes == WINS[0]) | (outcomes == WINS[1])
+        leaderboard = np.bincount(name_ids[won], weights=gains[won], minlength=size)
+        for name_id in np.flatnonzero(np.bincount(name_ids, minlength=size)):
+            name = names[name_id] if name_id < len(names) else f"#{name_id}"
+            if name not in self.net:
+                self.net[name] = np.zeros(self.periods, dtype=np.int64)
+                self.leaderboard[name] = 0
+            self.net[name] += net[name_id].astype(np.int64)
+            self.leaderboard[name] += int(leaderboard[name_id])
+
+
+def analyze(paths, periods=DEFAULT_PERIODS, reports=REPORT_NAMES, chunk_records=CHUNK_RECORDS):
+    totals = HistoryTotals(periods, reports)
+    for path in paths:
+        totals.add_file(path, chunk_records)
+    return totals
+
+
+def print_upcards(totals):
+    print(Colors.HEADER + "=== By Dealer Upcard ===" + Colors.END)
+    print(f"{'Upcard':>6} {'Hands':>12} {'Win':>7} {'Push':>7} {'Loss':>7} {'Bust':>7} {'Return':>8}")
+    for upcard in range(2, 12):
+        outcomes = totals.upcard_outcomes[upcard]
+        hands = int(outcomes.sum())
+        if not hands:
+            continue
+        bet = totals.upcard_bets[upcard]
+        returned = (totals.upcard_returns[upcard] - bet) / bet if bet else 0.0
+        print(f"{'A' if upcard == 11 else upcard:>6} {hands:>12,} {outcomes[WINS].sum() / hands:>7.2%} "
+              f"{outcomes[OUTCOME_CODES['push']] / hands:>7.2%} "
+              f"{(outcomes[OUTCOME_CODES['loss']] + outcomes[OUTCOME_CODES['bust']]) / hands:>7.2%} "
+              f"{outcomes[OUTCOME_CODES['bust']] / hands:>7.2%} {returned:>+8.2%}")
+
+
+def print_hits(totals):
+    print(Colors.HEADER + "=== Hitting by Total ===" + Colors.END)
+    print(f"{'Total':>6} {'Hits':>12} {'Busted':>7}")
+    for total in range(4, 21):
+        hits = int(totals.hits[total])
+        if hits:
+            print(f"{total:>6} {hits:>12,} {totals.hit_busts[total] / hits:>7.2%}")
+
+
+def print_players(totals):
+    print(Colors.HEADER + "=== Players ===" + Colors.END)
+    print(f"Net in each of {totals.periods} equal spans of the history, then the total and leaderboard gains:")
+    for name, net in sorted(totals.net.items(), key=lambda item: -item[1].sum()):
+        spans = ' '.join(f"{cents / 100:>+10,.0f}" for cents in net)
+        print(f"{name:<24} {spans}  net ${net.sum() / 100:,.2f}, leaderboard ${totals.leaderboard[name] / 100:,.2f}")
+
+
+REPORTS = {'upcards': print_upcards, 'hits': print_hits, 'players': print_players}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate recorded hand histories without loading them into memory")
+    parser.add_argument('paths', nargs='+', metavar='PATH', help="hand histories written with --record")
+    parser.add_argument('--report', nargs='+', choices=REPORT_NAMES, default=list(REPORT_NAMES),
+                        help="reports to show (default: all)")
+    parser.add_argument('--periods', type=int, default=DEFAULT_PERIODS,
+                        help=f"spans the players' net is split into, in file order (default: {DEFAULT_PERIODS})")
+    parser.add_argument('--chunk-records', type=int, default=CHUNK_RECORDS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.periods < 1 or args.chunk_records < 1:
+        parser.error("--periods and --chunk-records must be at least 1")
+
+    start = time.perf_counter()
+    try:
+        totals = analyze(args.paths, args.periods, args.report, args.chunk_records)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - start
+    for report in args.report:
+        REPORTS[report](totals)
+    size = sum(os.path.getsize(path) for path in args.paths)
+    print(f"{totals.sessions:,} sessions, {totals.rounds:,} rounds, {totals.hands:,} hands, "
+          f"{size / 2 ** 20:,.1f} MiB in {elapsed:.2f}s ({size / 2 ** 20 / elapsed if elapsed else 0:,.0f} MiB/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import io
+import os
+import queue
+import threading
+
+# Music for the terminal game. pygame is only imported, and the mixer only
+# started, the first time music is needed, on a background thread, so the game
+# never waits for SDL. The victory track is read into memory in the background
+# as well, so switching to it never stalls the game loop. The background
+# thread never prints: its warnings wait in a queue until report_warnings() is
+# called from the game's own thread, where stdout may be a paced or framed
+# stream.
+
+BACKGROUND_MUSIC_FILE = 'background_music.mp3'
+VICTORY_MUSIC_FILE = 'victory_music.mp3'
+
+
+class NullAudio:
+    # Used with --no-audio and in headless modes: never touches pygame
+    def play_background_music(self):
+        pass
+
+    def switch_to_victory_music(self):
+        pass
+
+    def stop_music(self):
+        pass
+
+    def report_warnings(self):
+        pass
+
+
+class PygameAudio:
+    def __init__(self, background_file=BACKGROUND_MUSIC_FILE, victory_file=VICTORY_MUSIC_FILE, warn=print):
+        self.background_file = background_file  # Ensure this file exists
+        self.victory_file = victory_file        # Ensure this file exists
+        self.warn = warn
+        self.mixer = None
+        self.error = None
+        self.disabled = False
+        self.victory_data = None
+        self._startup = None
+        self._warnings = queue.SimpleQueue()  # From the background thread
+
+    def report_warnings(self):
+        while not self._warnings.empty():
+            self.warn(self._warnings.get())
+
+    def _start(self):
+        # Import pygame, start the mixer and preload the victory track
+        try:
+            import pygame
+        except ImportError:
+            self.disabled = True
+            self._warnings.put("pygame is not installed. Music is turned off.")
+            return
+        try:
+            pygame.mixer.init()
+        except pygame.error as error:
+            self.disabled = True
+            self._warnings.put(f"Could not start audio ({error}). Music is turned off.")
+            return
+        self.mixer = pygame.mixer
+        self.error = pygame.error
+        if os.path.exists(self.victory_file):
+            with open(self.victory_file, 'rb') as f:
+                self.victory_data = f.read()
+
+    def _ready(self):
+        # Start the mixer on first use and wait for it before touching it
+        if self._startup is None:
+            self._startup = threading.Thread(target=self._start, daemon=True)
+            self._startup.start()
+        self._startup.join()
+        self.report_warnings()
+        return self.mixer
+
+    def play_background_music(self):
+        play = os.path.exists(self.background_file)
+        if not play:
+            self.warn(f"Background music file '{self.background_file}' not found.")
+        if self._startup is None:
+            # First use: start everything in the background and play when
+            # ready. The mixer is started and the victory track preloaded even
+            # without a background track, so the first win doesn't wait for them.
+            self._startup = threading.Thread(target=self._start_and_play, args=(play,), daemon=True)
+            self._startup.start()
+            return
+        if play and self._ready():
+            self._play(self.background_file)
+            self.report_warnings()
+
+    def _start_and_play(self, play):
+        self._start()
+        if play and self.mixer:
+            self._play(self.background_file)
+
+    def _play(self, source, namehint=''):
+        try:
+            self.mixer.music.load(source, namehint)
+            self.mixer.music.play(-1)  # Loop indefinitely
+        except self.error as error:
+            # Also called on the background thread, so always queued
+            self._warnings.put(f"Could not play music ({error}).")
+
+    def switch_to_victory_music(self):
+        if not os.path.exists(self.victory_file):
+            self.warn(f"Victory music file '{self.victory_file}' not found.")
+            return
+        if self._ready():
+            if self.victory_data is not None:
+                self._play(io.BytesIO(self.victory_data), 'mp3')
+            else:
+                self._play(self.victory_file)
+            self.report_warnings()
+
+    def stop_music(self):
+        # Nothing can be playing if the mixer was never started
+        if self._startup is not None:
+            mixer = self._ready()
+            if mixer:
+                mixer.music.stop()
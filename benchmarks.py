@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from BJ import (
+    ACE, STARTING_BALANCE, BlackjackGame, Deck, Hand,
+    Seat, new_headless_stats, play_headless_round,
+)
+from audio import NullAudio
+from pacing import Pacer
+from storage import JsonStorage, SqliteStorage
+from policies import DEFAULT_POLICY, get_policy
+
+# Throughput benchmarks for the engine, the renderer and persistence.
+# Each case is timed for at least --min-time seconds, --repeats times, and the
+# best rate is kept. Results are written as JSON and can be compared against a
+# baseline file saved from an earlier run:
+#   python benchmarks.py --save-baseline baseline.json
+#   python benchmarks.py --baseline baseline.json
+
+SEATS = (1, 5, 10, 25, 50)
+ENTRIES = (10, 1_000, 100_000)
+RENDER_CARDS = range(2, 11)
+HANDS_PER_RUN = 1000
+LEADERBOARD_WINS_PER_ROUND = 5  # update_leaderboard calls between saves
+
+
+def measure(run, min_time, repeats):
+    # run() does some work and returns how many operations it did
+    best = None
+    for _ in range(repeats):
+        ops = 0
+        start = time.perf_counter()
+        while True:
+            ops += run()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        rate = ops / elapsed
+        if best is None or rate > best['ops_per_sec']:
+            best = {'ops_per_sec': rate, 'ops': ops, 'seconds': elapsed}
+    return best
+
+
+def deal_cards_case():
+    deck = Deck()
+
+    def run():
+        # One shoe's worth of cards, reshuffling at the cut card as between rounds
+        for _ in range(len(deck.cards)):
+            deck.reshuffle_if_needed()
+            deck.deal_card()
+        return len(deck.cards)
+    return run
+
+
+def deal_hand(deck, num_cards):
+    # Each hand is a round of its own, so the shoe is reshuffled at the cut card
+    deck.reshuffle_if_needed()
+    return [deck.deal_card() for _ in range(num_cards)]
+
+
+def hand_value_case(kind):
+    rng = random.Random(1)
+    if kind == 'many_aces':
+        hands = [[ACE * 4 + rng.randrange(4) for _ in range(rng.randint(3, 6))] + [rng.randrange(52)]
+                 for _ in range(HANDS_PER_RUN)]
+    else:
+        deck = Deck(rng=rng)
+        hands = [deal_hand(deck, rng.randint(2, 4)) for _ in range(HANDS_PER_RUN)]
+
+    def run():
+        for cards in hands:
+            hand = Hand()
+            for card in cards:
+                hand.add_card(card)
+                hand.calculate_value()
+                hand.is_bust()
+        return len(hands)
+    return run
+
+
+def render_case(num_cards):
+    deck = Deck(rng=random.Random(2))
+    hands = [deal_hand(deck, num_cards) for _ in range(HANDS_PER_RUN)]
+
+    def run():
+        for cards in hands:
+            hand = Hand()
+            for card in cards:
+                hand.add_card(card)
+            hand.render_hand()
+        return len(hands)
+    return run
+
+
+def headless_round_case(seats):
+    deck = Deck(rng=random.Random(3))
+    policy = get_policy(DEFAULT_POLICY, deck.num_decks)
+    players = [Seat(f"AI {seat}", is_ai=True, policy=policy) for seat in range(1, seats + 1)]
+    stats = new_headless_stats(players)
+    leaderboard = {}
+
+    def run():
+        for _ in range(100):
+            play_headless_round(deck, players, stats, leaderboard)
+        return 100
+    return run
+
+
+def open_bench_storage(kind, folder):
+    if kind == 'sqlite':
+        return SqliteStorage(os.path.join(folder, 'bench.db'), warn=print)
+    return JsonStorage(os.path.join(folder, 'players.json'), os.path.join(folder, 'current_player.json'),
+                       os.path.join(folder, 'leaderboard.json'), warn=print)
+
+
+def bench_game(kind, folder, entries):
+    os.makedirs(folder)
+    storage = open_bench_storage(kind, folder)
+    with storage.batch():
+        for index in range(entries):
+            storage.save_player(f"Player {index}", STARTING_BALANCE)
+            storage.save_leaderboard_entry(f"Player {index}", index)
+    return BlackjackGame(storage=storage, pacer=Pacer(0), audio=NullAudio())
+
+
+def save_players_case(kind, folder, entries):
+    game = bench_game(kind, folder, entries)
+    rng = random.Random(4)
+    players_data = game.load_players()
+
+    def run():
+        for data in players_data.values():
+            data['balance'] = rng.randint(1, 10_000)
+        game.save_players_to_file(players_data)
+        return 1
+    return run
+
+
+def update_leaderboard_case(kind, folder, entries):
+    game = bench_game(kind, folder, entries)
+    rng = random.Random(5)
+
+    def run():
+        # One round's wins, saved at the end of the round as in the game loop
+        for _ in range(LEADERBOARD_WINS_PER_ROUND):
+            game.update_leaderboard(f"Player {rng.randrange(entries)}", rng.randint(1, 200))
+        game.save_leaderboard()
+        return LEADERBOARD_WINS_PER_ROUND
+    return run
+
+
+def cases(seats, entries, backends, folder):
+    # (name, factory) pairs; factories do their setup outside the timed part
+    yield 'deck.deal_card', deal_cards_case
+    for kind in ('typical', 'many_aces'):
+        yield f"hand.value[{kind}]", lambda kind=kind: hand_value_case(kind)
+    for num_cards in RENDER_CARDS:
+        yield f"hand.render[cards={num_cards}]", lambda num_cards=num_cards: render_case(num_cards)
+    for count in seats:
+        yield f"round.headless[seats={count}]", lambda count=count: headless_round_case(count)
+    for kind in backends:
+        for count in entries:
+            path = os.path.join(folder, f"{kind}-{count}")
+            yield (f"storage.save_players[{kind},entries={count}]",
+                   lambda kind=kind, count=count, path=path: save_players_case(kind, path + '-players', count))
+            yield (f"storage.update_leaderboard[{kind},entries={count}]",
+                   lambda kind=kind, count=count, path=path: update_leaderboard_case(kind, path + '-leaderboard', count))
+
+
+def run_benchmarks(seats=SEATS, entries=ENTRIES, backends=('json', 'sqlite'), only=None, min_time=0.2, repeats=3,
+                   progress=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for name, factory in cases(seats, entries, backends, folder):
+            if only and not any(part in name for part in only):
+                continue
+            if progress:
+                progress(name)
+            results[name] = measure(factory(), min_time, repeats)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # Change in ops/sec against the baseline; below -tolerance is a regression
+    comparison = {}
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['ops_per_sec']
+        change = result['ops_per_sec'] / before - 1 if before else 0.0
+        comparison[name] = {
+            'baseline_ops_per_sec': before,
+            'ops_per_sec': result['ops_per_sec'],
+            'change': change,
+            'regression': change < -tolerance,
+        }
+    return comparison
+
+
+def print_table(results, comparison):
+    for name, result in results.items():
+        line = f"{name:<48} {result['ops_per_sec']:>16,.1f} ops/sec"
+        if name in comparison:
+            change = comparison[name]
+            line += f"  {change['change'] * 100:+6.1f}%"
+            if change['regression']:
+                line += "  REGRESSION"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Blackjack throughput benchmarks")
+    parser.add_argument('--only', nargs='+', metavar='TEXT', help="only run cases whose name contains one of these")
+    parser.add_argument('--quick', action='store_true', help="skip the 100k-entry storage cases and seats above 10")
+    parser.add_argument('--storage', nargs='+', choices=('json', 'sqlite'), default=['json', 'sqlite'],
+                        help="storage backends to benchmark (default: both)")
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds to time each case for (default: 0.2)")
+    parser.add_argument('--repeats', type=int, default=3, help="timings per case; the best is kept (default: 3)")
+    parser.add_argument('--output', metavar='PATH', help="write the JSON results here and print a table instead")
+    parser.add_argument('--baseline', metavar='PATH', help="compare against results saved from an earlier run")
+    parser.add_argument('--save-baseline', metavar='PATH', help="also save these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="slowdown allowed before a case counts as a regression (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    seats = [count for count in SEATS if count <= 10] if args.quick else SEATS
+    entries = [count for count in ENTRIES if count <= 1_000] if args.quick else ENTRIES
+    progress = lambda name: print(f"Running {name}...", file=sys.stderr)
+    results = run_benchmarks(seats, entries, args.storage, args.only, args.min_time, args.repeats, progress)
+
+    comparison = {}
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            comparison = compare(results, json.load(f)['results'], args.tolerance)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'min_time': args.min_time,
+        'repeats': args.repeats,
+        'results': results,
+    }
+    if args.baseline:
+        report['baseline'] = args.baseline
+        report['comparison'] = comparison
+
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+        print_table(results, comparison)
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            f.write(text)
+
+    regressions = [name for name, change in comparison.items() if change['regression']]
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import argparse
+import math
+import random
+import time
+
+from BJ import (
+    DEFAULT_NUM_DECKS, DEFAULT_PENETRATION, MIN_DECKS, MAX_DECKS,
+    Colors, Deck, RoundEngine, Seat, new_seed,
+)
+from policies import BET_UNIT, POLICIES, get_policy
+
+# Head-to-head comparison of two AI policies.
+#
+# Both policies play every round from the same shoe state, so they see the
+# same count and the same cards (common random numbers): the shoe is saved
+# before the first policy's round and put back for the second one's. Luck of
+# the deal then mostly cancels out of the per-round difference, which needs
+# far fewer rounds to pin down than two separate runs would.
+#
+# The run stops as soon as the answer is known. Every CHECK_EVERY rounds the
+# difference in EV (units of BET_UNIT per round) is checked against a
+# confidence sequence: an interval that holds at every check at once, so
+# stopping on the first decisive one keeps the error rate at alpha. The run
+# ends when the interval excludes 0 (one policy is better), lies inside
+# +/- margin (the difference is negligible), or max_rounds is reached.
+
+COMPARE_BALANCE = 10 ** 9  # Large enough that no bet is ever cut short
+ROUND_CARDS = 24  # More cards than one seat and the dealer can draw in a round
+CHECK_EVERY = 1000
+DEFAULT_MARGIN = 0.01
+DEFAULT_ALPHA = 0.05
+DEFAULT_MAX_ROUNDS = 2_000_000
+TUNED_ROUNDS = 20_000  # Rounds at which the confidence sequence is tightest
+
+BETTER = 'better'
+NEGLIGIBLE = 'negligible'
+UNDECIDED = 'undecided'
+
+
+def confidence_radius(rounds, variance, alpha, tuned_rounds=TUNED_ROUNDS):
+    # Half-width of a two-sided asymptotic confidence sequence for a mean
+    # (Waudby-Smith et al., "Time-uniform central limit theory")
+    rho2 = (-2 * math.log(alpha) + math.log(-2 * math.log(alpha) + 1)) / tuned_rounds
+    spread = rounds * rho2 + 1
+    return math.sqrt(variance * 2 * spread / (rounds * rounds * rho2) * math.log(math.sqrt(spread) / alpha))
+
+
+def play_round(deck, seat):
+    # One round for a lone AI seat; returns its net result in bet units
+    engine = RoundEngine(deck, [seat])
+    engine.deal()
+    engine.place_ai_bets()
+    engine.play_ai_turn(seat, engine.first_moves()[0])
+    dealer_value, dealer_bust = engine.play_dealer()
+    bet = seat.bet
+    _, winnings = engine.settle(seat, dealer_value, dealer_bust)
+    engine.finish()
+    return (winnings - bet) / BET_UNIT
+
+
+class PairedTotals:
+    # Running sums of both policies' results and of their difference
+    def __init__(self):
+        self.rounds = 0
+        self.sums = [0.0, 0.0, 0.0]  # first, second, difference
+        self.squares = [0.0, 0.0, 0.0]
+
+    def add(self, first, second):
+        self.rounds += 1
+        for index, value in enumerate((first, second, first - second)):
+            self.sums[index] += value
+            self.squares[index] += value * value
+
+    def mean(self, index):
+        return self.sums[index] / self.rounds
+
+    def variance(self, index):
+        mean = self.mean(index)
+        return max(self.squares[index] / self.rounds - mean * mean, 0.0)
+
+
+def decide(difference, radius, margin):
+    if difference - radius > 0 or difference + radius < 0:
+        return BETTER
+    if -margin < difference - radius and difference + radius < margin:
+        return NEGLIGIBLE
+    return UNDECIDED
+
+
+def compare_policies(first, second, num_decks=DEFAULT_NUM_DECKS, penetration=DEFAULT_PENETRATION, seed=None,
+                     margin=DEFAULT_MARGIN, alpha=DEFAULT_ALPHA, max_rounds=DEFAULT_MAX_ROUNDS,
+                     check_every=CHECK_EVERY):
+    if not 0 < alpha < 1:
+        raise ValueError("alpha must be between 0 and 1.")
+    if margin <= 0:
+        raise ValueError("The margin must be greater than 0.")
+    if seed is None:
+        seed = new_seed()
+    deck = Deck(num_decks, penetration, rng=random.Random(seed))
+    seats = [Seat(name, COMPARE_BALANCE, is_ai=True, policy=get_policy(name, num_decks)) for name in (first, second)]
+    totals = PairedTotals()
+    verdict = UNDECIDED
+    radius = math.inf
+    start = time.perf_counter()
+    while totals.rounds < max_rounds:
+        for _ in range(min(check_every, max_rounds - totals.rounds)):
+            # Reshuffle here rather than in the deal, so both policies get the
+            # same shoe, and a round never runs it dry halfway through
+            if not deck.reshuffle_if_needed() and deck.cards_left() < ROUND_CARDS:
+                deck.shuffle()
+            before = deck.save_state()
+            first_result = play_round(deck, seats[0])
+            after = deck.save_state()
+            deck.restore_state(before)
+            second_result = play_round(deck, seats[1])
+            deck.restore_state(after)  # The shoe goes on from the first policy's round
+            totals.add(first_result, second_result)
+        radius = confidence_radius(totals.rounds, totals.variance(2), alpha)
+        verdict = decide(totals.mean(2), radius, margin)
+        if verdict != UNDECIDED:
+            break
+    elapsed = time.perf_counter() - start
+
+    # Separate shoes would need this many times the rounds for the same interval
+    independent_variance = totals.variance(0) + totals.variance(1)
+    difference_variance = totals.variance(2)
+    return {
+        'policies': [first, second],
+        'seed': seed,
+        'rounds': totals.rounds,
+        'seconds': elapsed,
+        'ev': [totals.mean(0), totals.mean(1)],
+        'difference': totals.mean(2),
+        'interval': [totals.mean(2) - radius, totals.mean(2) + radius],
+        'verdict': verdict,
+        'margin': margin,
+        'alpha': alpha,
+        'variance_reduction': independent_variance / difference_variance if difference_variance else math.inf,
+    }
+
+
+def print_comparison(result):
+    first, second = result['policies']
+    low, high = result['interval']
+    confidence = f"{(1 - result['alpha']) * 100:g}%"
+    print(Colors.HEADER + f"=== {first} vs {second} ===" + Colors.END)
+    for name, ev in zip(result['policies'], result['ev']):
+        print(f"{name}: EV {ev:+.4f} units per round")
+    print(f"Difference ({first} - {second}): {result['difference']:+.4f}, "
+          f"{confidence} interval [{low:+.4f}, {high:+.4f}]")
+    if result['verdict'] == BETTER:
+        winner = first if result['difference'] > 0 else second
+        print(Colors.GREEN + f"{winner} is better." + Colors.END)
+    elif result['verdict'] == NEGLIGIBLE:
+        print(Colors.GREEN + f"The difference is within +/-{result['margin']:g} units per round." + Colors.END)
+    else:
+        print(Colors.YELLOW + "Undecided: the round limit came first." + Colors.END)
+    print(f"Rounds: {result['rounds']:,} per policy in {result['seconds']:.1f}s  Seed: {result['seed']}")
+    if math.isfinite(result['variance_reduction']):
+        print(f"Playing the same shoes cut the variance of the difference {result['variance_reduction']:,.1f}x: "
+              f"separate shoes would need that many times the rounds for the same interval.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two AI policies on the same shoes, stopping early")
+    parser.add_argument('policies', nargs=2, choices=sorted(POLICIES), metavar='POLICY',
+                        help=f"the two policies to compare ({', '.join(sorted(POLICIES))})")
+    parser.add_argument('--margin', type=float, default=DEFAULT_MARGIN,
+                        help=f"EV difference, in units per round, small enough not to matter "
+                             f"(default: {DEFAULT_MARGIN})")
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA,
+                        help=f"chance of a wrong verdict (default: {DEFAULT_ALPHA})")
+    parser.add_argument('--max-rounds', type=int, default=DEFAULT_MAX_ROUNDS,
+                        help=f"stop undecided after this many rounds (default: {DEFAULT_MAX_ROUNDS:,})")
+    parser.add_argument('--check-every', type=int, default=CHECK_EVERY, metavar='ROUNDS')
+    parser.add_argument('--decks', type=int, default=DEFAULT_NUM_DECKS, choices=range(MIN_DECKS, MAX_DECKS + 1),
+                        metavar=f"{MIN_DECKS}-{MAX_DECKS}")
+    parser.add_argument('--penetration', type=float, default=DEFAULT_PENETRATION)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+    if args.check_every < 1 or args.max_rounds < 1:
+        parser.error("--check-every and --max-rounds need at least 1 round")
+
+    try:
+        result = compare_policies(*args.policies, args.decks, args.penetration, args.seed,
+                                  args.margin, args.alpha, args.max_rounds, args.check_every)
+    except ValueError as error:
+        parser.error(str(error))
+    print_comparison(result)
+
+
+if __name__ == "__main__":
+    main()
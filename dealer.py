@@ -0,0 +1,93 @@
+from functools import lru_cache
+
+# Exact odds of the dealer's final total. The dealer's play is fixed (hit
+# until 17, standing on all 17s), so given the upcard and the cards it can
+# still draw, the chance of finishing on 17, 18, 19, 20, 21 or busting can be
+# worked out exactly instead of simulated.
+#
+# A composition is a tuple of the number of cards of each value 2-11 that the
+# dealer can draw, 10, J, Q and K all counting 10 and an ace 11. For a live
+# round that is every card not yet seen, the dealer's hole card included.
+#
+# Distributions are kept in an LRU cache keyed by (upcard, composition), so
+# every seat that asks about the same shoe in a round shares one computation.
+# The cache is bounded, since a live shoe gives a new composition every round.
+
+CARD_RANKS = range(2, 12)  # Card values, with 11 for an ace
+DEALER_TOTALS = (17, 18, 19, 20, 21)
+BUST = 5  # Index of the bust probability in a distribution
+CACHE_SIZE = 4096  # Distributions kept; each is a 6-tuple
+
+
+def add_card(total, soft, value):
+    # Add a card to a (total, soft) hand, where soft means an ace is counted as 11
+    if value == 11:
+        if total + 11 <= 21:
+            return total + 11, True
+        total += 1
+    else:
+        total += value
+    if total > 21 and soft:
+        return total - 10, False
+    return total, soft
+
+
+def final_totals(total, soft, composition):
+    # Probabilities of the dealer finishing on 17, 18, 19, 20, 21 or busting
+    # from a (total, soft) hand. The memo lives for one call, so the states it
+    # explores don't outlast the distribution they add up to.
+    memo = {}
+    cards = sum(composition)
+    counts = list(composition)
+
+    def outcomes(total, soft, cards):
+        if total > 21:
+            return (0.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+        if total >= 17:
+            outcome = [0.0] * 6
+            outcome[total - 17] = 1.0
+            return tuple(outcome)
+        key = (total, soft, tuple(counts))
+        result = memo.get(key)
+        if result is not None:
+            return result
+        result = [0.0] * 6
+        for index, count in enumerate(counts):
+            if not count:
+                continue
+            counts[index] = count - 1
+            weight = count / cards
+            for i, p in enumerate(outcomes(*add_card(total, soft, CARD_RANKS[index]), cards - 1)):
+                result[i] += weight * p
+            counts[index] = count
+        result = memo[key] = tuple(result)
+        return result
+
+    return outcomes(total, soft, cards)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def dealer_distribution(upcard, composition):
+    # The dealer's hole card and draws all come out of composition; upcard is
+    # the value of the upcard (2-11)
+    if not sum(composition):
+        raise ValueError("The dealer has no cards left to draw.")
+    return final_totals(*add_card(0, False, upcard), composition)
+
+
+def stand_odds(total, distribution):
+    # (win, push, loss) probabilities of standing on total against a distribution
+    if total > 21:
+        return 0.0, 0.0, 1.0
+    win = distribution[BUST] + sum(p for dealer_total, p in zip(DEALER_TOTALS, distribution) if dealer_total < total)
+    push = distribution[total - 17] if total >= 17 else 0.0
+    return win, push, 1.0 - win - push
+
+
+def cache_stats():
+    info = dealer_distribution.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+
+def clear_cache():
+    dealer_distribution.cache_clear()
@@ -0,0 +1,171 @@
+from bisect import bisect_left, insort
+from itertools import chain, islice
+
+# Ranked leaderboard index. Entries are kept in order in short sorted blocks,
+# with a Fenwick tree of block lengths, next to a dict of amounts. Finding an
+# entry is a binary search over the blocks' last keys, an insert or delete
+# only shifts one block (at most 2 * BLOCK_SIZE entries), and a rank is a
+# prefix sum of the tree, so updates and rank queries are O(log n). Splitting
+# or dropping a block rebuilds the tree, once per BLOCK_SIZE updates at most.
+# Top-K and page queries never sort. Changes are only written to storage by
+# flush(), once per round.
+
+BLOCK_SIZE = 512
+
+
+class Leaderboard:
+    def __init__(self, storage):
+        self.storage = storage
+        self.amounts = {}
+        # Keys (-amount, seq, name), best first, split into sorted blocks
+        self.blocks = []
+        self.maxes = []  # Last key of each block
+        self.tree = []  # Fenwick tree of block lengths
+        self.seq = {}  # Insertion order, so ties rank like the old stable sort
+        self.next_seq = 0
+        self.dirty = {}  # Names changed since the last flush, in the order they changed
+        for name, amount in storage.load_leaderboard().items():
+            self._insert(name, amount)
+
+    def _key(self, name):
+        return (-self.amounts[name], self.seq[name], name)
+
+    def _rebuild_tree(self):
+        tree = [len(block) for block in self.blocks]
+        for index in range(len(tree)):
+            parent = index | (index + 1)
+            if parent < len(tree):
+                tree[parent] += tree[index]
+        self.tree = tree
+
+    def _grow(self, index, delta):
+        while index < len(self.tree):
+            self.tree[index] += delta
+            index |= index + 1
+
+    def _count_before(self, index):
+        # Entries in the blocks before block index
+        total = 0
+        while index > 0:
+            total += self.tree[index - 1]
+            index &= index - 1
+        return total
+
+    def _locate(self, position):
+        # Block index and offset of the 0-based position, by descending the tree
+        index = 0
+        step = 1 << len(self.tree).bit_length()
+        while step:
+            if index + step <= len(self.tree) and self.tree[index + step - 1] <= position:
+                index += step
+                position -= self.tree[index - 1]
+            step >>= 1
+        return index, position
+
+    def _insert(self, name, amount):
+        if name not in self.seq:
+            self.seq[name] = self.next_seq
+            self.next_seq += 1
+        self.amounts[name] = amount
+        key = self._key(name)
+        if not self.blocks:
+            self.blocks.append([key])
+            self.maxes.append(key)
+            self._rebuild_tree()
+            return
+        index = min(bisect_left(self.maxes, key), len(self.blocks) - 1)
+        block = self.blocks[index]
+        insort(block, key)
+        self.maxes[index] = block[-1]
+        if len(block) > 2 * BLOCK_SIZE:
+            self.blocks[index:index + 1] = [block[:BLOCK_SIZE], block[BLOCK_SIZE:]]
+            self.maxes[index:index + 1] = [block[BLOCK_SIZE - 1], block[-1]]
+            self._rebuild_tree()
+        else:
+            self._grow(index, 1)
+
+    def _remove(self, name):
+        key = self._key(name)
+        index = bisect_left(self.maxes, key)
+        block = self.blocks[index]
+        del block[bisect_left(block, key)]
+        if block:
+            self.maxes[index] = block[-1]
+            self._grow(index, -1)
+        else:
+            del self.blocks[index]
+            del self.maxes[index]
+            self._rebuild_tree()
+
+    def _entries(self, start=0, stop=None):
+        # Keys from the 0-based position start up to stop, best first
+        if start >= len(self.amounts):
+            return []
+        index, offset = self._locate(start)
+        keys = chain(self.blocks[index][offset:], chain.from_iterable(islice(self.blocks, index + 1, None)))
+        return list(keys if stop is None else islice(keys, stop - start))
+
+    def __contains__(self, name):
+        return name in self.amounts
+
+    def __getitem__(self, name):
+        return self.amounts[name]
+
+    def get(self, name, default=None):
+        return self.amounts.get(name, default)
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def __bool__(self):
+        return bool(self.amounts)
+
+    def items(self):
+        return self.amounts.items()
+
+    def __setitem__(self, name, amount):
+        if name in self.amounts:
+            self._remove(name)
+        self._insert(name, amount)
+        self.dirty[name] = None
+
+    def __delitem__(self, name):
+        self._remove(name)
+        del self.amounts[name]
+        del self.seq[name]
+        self.dirty[name] = None
+
+    def add(self, name, amount):
+        self[name] = self.amounts.get(name, 0) + amount
+
+    def top(self, k=None):
+        # The k best entries as (name, amount), best first
+        return [(name, -amount) for amount, _, name in self._entries(0, k)]
+
+    def rank(self, name):
+        # 1-based position of a player, or None if they have no entry
+        if name not in self.amounts:
+            return None
+        key = self._key(name)
+        index = bisect_left(self.maxes, key)
+        return self._count_before(index) + bisect_left(self.blocks[index], key) + 1
+
+    def page(self, number, size=20):
+        # Entries on a 1-based page, as (rank, name, amount)
+        start = (number - 1) * size
+        return [(start + offset, name, -amount)
+                for offset, (amount, _, name) in enumerate(self._entries(start, start + size), start=1)]
+
+    def page_count(self, size=20):
+        return max(1, -(-len(self.amounts) // size))
+
+    def flush(self):
+        # Write every entry changed since the last flush in one batch
+        if self.dirty:
+            with self.storage.batch():
+                for name in self.dirty:
+                    if name in self.amounts:
+                        self.storage.save_leaderboard_entry(name, self.amounts[name])
+                    else:
+                        self.storage.delete_leaderboard_entry(name)
+            self.dirty.clear()
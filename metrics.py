@@ -0,0 +1,131 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# In-process metrics: counters and phase timers, exported on demand as a
+# Prometheus text file (for node_exporter's textfile collector) or a JSON
+# snapshot. There are no locks: the game updates metrics from its one thread,
+# every update is a single dict operation, and exports work on a copy.
+#
+# Timers keep a count and the total and longest seconds. Phase times are
+# wall-clock time, so they include the Pacer's pauses and any wait for input.
+# Given a pause_clock (seconds paused so far), each timer also keeps how much
+# of its time was pauses.
+
+PREFIX = 'blackjack'
+
+COUNTER_HELP = {
+    'rounds': "Rounds played",
+    'hands': "Hands played, one per seat and round",
+    'busts': "Hands that went over 21",
+    'blackjacks': "Hands dealt a natural blackjack",
+    'doubles': "Hands doubled down",
+    'reshuffles': "Shoe reshuffles",
+    'bytes_written': "Bytes written to storage and the hand history",
+}
+TIMER_HELP = {
+    'phase': "Time spent in each phase of a round",
+    'headless_run': "Time spent in a headless run",
+}
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels) + '}'
+
+
+class Metrics:
+    def __init__(self, pause_clock=None):
+        self.pause_clock = pause_clock
+        self.counters = {}  # (name, labels) -> value
+        self.timers = {}  # (name, labels) -> [count, total seconds, max seconds, paused seconds]
+
+    def inc(self, name, amount=1, labels=()):
+        # labels is a tuple of (label, value) pairs
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name, value, labels=()):
+        # For totals kept elsewhere, like the bytes a storage backend has written
+        self.counters[(name, labels)] = value
+
+    def observe(self, name, seconds, paused=0.0, labels=()):
+        timer = self.timers.get((name, labels))
+        if timer is None:
+            self.timers[(name, labels)] = [1, seconds, seconds, paused]
+            return
+        timer[0] += 1
+        timer[1] += seconds
+        timer[2] = max(timer[2], seconds)
+        timer[3] += paused
+
+    def start(self):
+        # For a phase that doesn't fit a with block: pass the result to stop()
+        return time.perf_counter(), self.pause_clock() if self.pause_clock else 0.0
+
+    def stop(self, name, started, labels=()):
+        start, paused = started
+        paused = self.pause_clock() - paused if self.pause_clock else 0.0
+        self.observe(name, time.perf_counter() - start, paused, labels)
+
+    @contextmanager
+    def time(self, name, labels=()):
+        started = self.start()
+        try:
+            yield
+        finally:
+            self.stop(name, started, labels)
+
+    def snapshot(self):
+        counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self.counters.copy().items())]
+        timers = [{'name': name, 'labels': dict(labels), 'count': count, 'total_seconds': total,
+                   'max_seconds': longest, 'paused_seconds': paused}
+                  for (name, labels), (count, total, longest, paused) in sorted(self.timers.copy().items())]
+        return {'time': time.time(), 'counters': counters, 'timers': timers}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=4)
+
+    def to_prometheus(self):
+        # Lines are grouped by metric family, as the text format requires
+        snapshot = self.snapshot()
+        families = {}  # metric -> (type, help, lines)
+
+        def add(metric, kind, help_text, line):
+            families.setdefault(metric, (kind, help_text, []))[2].append(line)
+
+        for counter in snapshot['counters']:
+            metric = f"{PREFIX}_{counter['name']}_total"
+            add(metric, 'counter', COUNTER_HELP.get(counter['name'], counter['name']),
+                f"{metric}{format_labels(counter['labels'].items())} {counter['value']}")
+        for timer in snapshot['timers']:
+            metric = f"{PREFIX}_{timer['name']}_seconds"
+            labels = format_labels(timer['labels'].items())
+            help_text = TIMER_HELP.get(timer['name'], timer['name'])
+            add(metric, 'summary', help_text, f"{metric}_count{labels} {timer['count']}")
+            add(metric, 'summary', help_text, f"{metric}_sum{labels} {timer['total_seconds']:.6f}")
+            add(f"{metric}_max", 'gauge', f"{help_text}, longest", f"{metric}_max{labels} {timer['max_seconds']:.6f}")
+            paused = f"{PREFIX}_{timer['name']}_paused_seconds_total"
+            add(paused, 'counter', f"{help_text}, in pauses", f"{paused}{labels} {timer['paused_seconds']:.6f}")
+        lines = []
+        for metric, (kind, help_text, samples) in families.items():
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines += samples
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        # JSON for a .json path, Prometheus text otherwise. The file is swapped
+        # in whole, so a collector never reads half of it.
+        text = self.to_json() if path.endswith('.json') else self.to_prometheus()
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(text)
+        os.replace(temp_path, path)
@@ -0,0 +1,59 @@
+import time
+
+# Pacing for the terminal game. Every delay goes through a Pacer, which scales
+# it by a global speed factor (0 = instant, 1 = normal, 0.25 = fast) and takes
+# it just before the next output. Delays with no output in between are merged
+# into the longest of them instead of adding up.
+
+
+class Pacer:
+    def __init__(self, speed=1.0, sleep=time.sleep):
+        if speed < 0:
+            raise ValueError("Speed must be 0 or more.")
+        self.speed = speed
+        self.pending = 0.0
+        self.total_waited = 0.0  # Seconds actually spent waiting
+        self.waits = 0
+        self.coalesced = 0  # Delays merged into another one
+        self._sleep = sleep
+
+    def wait(self, seconds):
+        delay = seconds * self.speed
+        if delay <= 0:
+            return
+        if self.pending:
+            self.coalesced += 1
+        self.pending = max(self.pending, delay)
+
+    def flush(self):
+        # Take the pending delay now, before something is shown
+        if self.pending:
+            delay, self.pending = self.pending, 0.0
+            start = time.perf_counter()
+            self._sleep(delay)
+            self.total_waited += time.perf_counter() - start
+            self.waits += 1
+
+
+class PacedStream:
+    # Wraps stdout so the pending delay is taken before anything is written.
+    # input() flushes stdout before showing its prompt, so prompts wait too.
+    # Whatever the stream still holds back is shown before the delay.
+    def __init__(self, stream, pacer):
+        self.stream = stream
+        self.pacer = pacer
+
+    def write(self, text):
+        if self.pacer.pending:
+            self.stream.flush()
+            self.pacer.flush()
+        return self.stream.write(text)
+
+    def flush(self):
+        if self.pacer.pending:
+            self.stream.flush()
+            self.pacer.flush()
+        return self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
@@ -0,0 +1,68 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from BJ import DEFAULT_NUM_DECKS, DEFAULT_PENETRATION, run_headless
+from strategy import load_strategy
+
+# Multi-core headless simulation. Rounds are split into one shard per worker
+# process, every worker seeds its shoe from the master seed, and the counters
+# are merged in worker order, so a master seed and worker count always give
+# bit-identical results.
+
+COUNTERS = ('rounds', 'hands', 'wins', 'losses', 'pushes', 'busts', 'blackjacks', 'doubles', 'rebuys', 'high_wins',
+            'reshuffles', 'bytes_written')
+
+
+def worker_seeds(master_seed, workers):
+    rng = random.Random(master_seed)
+    return [rng.getrandbits(64) for _ in range(workers)]
+
+
+def shard_rounds(rounds, workers):
+    # Split rounds as evenly as possible, the first shards taking the remainder
+    base, extra = divmod(rounds, workers)
+    return [base + (1 if index < extra else 0) for index in range(workers)]
+
+
+def run_shard(job):
+    rounds, num_ai, num_decks, penetration, seed, record, policies = job
+    return run_headless(rounds, num_ai, num_decks, penetration, seed, record=record, policies=policies)
+
+
+def merge_stats(results):
+    merged = {counter: 0 for counter in COUNTERS}
+    merged['net'] = {}
+    merged['leaderboard'] = {}
+    merged['by_count'] = {}
+    merged['policies'] = {}
+    for stats in results:
+        merged['policies'].update(stats['policies'])
+        for counter in COUNTERS:
+            merged[counter] += stats[counter]
+        for name, amount in stats['net'].items():
+            merged['net'][name] = merged['net'].get(name, 0) + amount
+        for name, amount in stats['leaderboard'].items():
+            merged['leaderboard'][name] = merged['leaderboard'].get(name, 0) + amount
+        for bucket, row in stats['by_count'].items():
+            totals = merged['by_count'].setdefault(bucket, [0, 0, 0])
+            for index, amount in enumerate(row):
+                totals[index] += amount
+    return merged
+
+
+def run_parallel(rounds, num_ai=5, num_decks=DEFAULT_NUM_DECKS, penetration=DEFAULT_PENETRATION,
+                 master_seed=0, workers=None, record=None, policies=None):
+    workers = workers or os.cpu_count() or 1
+    # Solve the strategy table once up front instead of in every worker
+    load_strategy(num_decks)
+    seeds = worker_seeds(master_seed, workers)
+    # Each worker records to its own file, named after its shard
+    jobs = [(shard, num_ai, num_decks, penetration, seed, f"{record}.{index}" if record else None, policies)
+            for index, (shard, seed) in enumerate(zip(shard_rounds(rounds, workers), seeds)) if shard]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_shard, jobs))
+    merged = merge_stats(results)
+    merged['workers'] = workers
+    merged['master_seed'] = master_seed
+    return merged
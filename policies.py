@@ -0,0 +1,80 @@
+from strategy import load_strategy
+
+# AI policies: how an AI seat bets and plays. Policies are registered by name
+# and every AI seat has its own, so one table can mix strategy variants.
+#
+# Decisions are made in batches. decide_bets gets the balances of every seat
+# of the policy that is about to bet, and decide_moves gets the hands of every
+# seat that has a decision to make, as (total, soft, can_double) with the
+# dealer's upcard as its value (2-11). Each returns one answer per seat, so a
+# large table makes a few calls per round instead of one per seat and card.
+
+DEFAULT_POLICY = 'counter'
+
+BET_UNIT = 100
+BET_SPREAD = {2: 2, 3: 4, 4: 8}  # Units bet at each true count; 1 below 2, 8 from 4 up
+
+POLICIES = {}
+_instances = {}
+
+
+def register_policy(name):
+    def register(cls):
+        cls.name = name
+        POLICIES[name] = cls
+        return cls
+    return register
+
+
+def get_policy(name, num_decks):
+    # Policies hold no per-seat state, so seats share one instance
+    key = (name, num_decks)
+    if key not in _instances:
+        if name not in POLICIES:
+            raise ValueError(f"Unknown AI policy '{name}'. Choose from: {', '.join(sorted(POLICIES))}.")
+        _instances[key] = POLICIES[name](num_decks)
+    return _instances[key]
+
+
+class Policy:
+    name = None
+
+    def __init__(self, num_decks):
+        self.num_decks = num_decks
+
+    def decide_bets(self, balances, true_count):
+        # A flat unit, or whatever is left
+        return [min(BET_UNIT, balance) for balance in balances]
+
+    def decide_moves(self, states, upcard):
+        raise NotImplementedError
+
+
+@register_policy('threshold')
+class ThresholdPolicy(Policy):
+    # The original AI: hit below 17, never double
+    stand_on = 17
+
+    def decide_moves(self, states, upcard):
+        stand_on = self.stand_on
+        return ['h' if total < stand_on else 's' for total, soft, can_double in states]
+
+
+@register_policy('basic')
+class BasicStrategyPolicy(Policy):
+    # The solved basic strategy for the shoe, with flat bets
+    def __init__(self, num_decks):
+        super().__init__(num_decks)
+        self.strategy = load_strategy(num_decks)
+
+    def decide_moves(self, states, upcard):
+        move = self.strategy.move
+        return [move(total, soft, upcard, can_double) for total, soft, can_double in states]
+
+
+@register_policy('counter')
+class CounterPolicy(BasicStrategyPolicy):
+    # Basic strategy, spreading bets from 1 to 8 units with the Hi-Lo true count
+    def decide_bets(self, balances, true_count):
+        bet = BET_UNIT * (1 if true_count < 2 else BET_SPREAD[min(int(true_count), 4)])
+        return [min(bet, balance) for balance in balances]
@@ -0,0 +1,203 @@
+import cProfile
+import fnmatch
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Profiling for --profile. Both modes write a text report to <prefix>.txt,
+# adding a checkpoint every N rounds and the hot spots when the run ends.
+#
+#   full    cProfile for per-function times, and tracemalloc for memory growth
+#           by source line since the end of the first round, after setup. Also saves <prefix>.prof for
+#           pstats or snakeviz. Slow: meant for a profiling session.
+#   sample  A background thread looks at the main thread's stack 1000 times a
+#           second and counts the functions it finds there. Checkpoints show
+#           the process's peak memory. Cheap enough to leave on.
+#
+# The sampler needs the GIL to look, and the main thread only hands it over
+# every sys.getswitchinterval() (5 ms by default), so sampling shortens the
+# switch interval to half the sample interval and restores it at the end.
+
+TOP = 25  # Functions and lines shown in each listing
+SAMPLE_INTERVAL = 0.001
+MAX_STACK_DEPTH = 64
+
+
+def peak_memory_mb():
+    # Peak resident memory of the process, where the platform reports it
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def describe_code(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+
+class Profiler:
+    def __init__(self, prefix='blackjack-profile', every=1000):
+        if every < 1:
+            raise ValueError("Profile snapshots need at least 1 round between them.")
+        self.prefix = prefix
+        self.every = every
+        self.rounds = 0
+        self.started = 0.0
+        self.report = None
+
+    def write(self, text):
+        self.report.write(text + '\n')
+        self.report.flush()  # Readable while a long session is still running
+
+    def start(self):
+        self.report = open(self.prefix + '.txt', 'w')
+        self.started = time.perf_counter()
+        self.write(f"=== {self.mode} profile, a checkpoint every {self.every:,} rounds ===")
+
+    def round_done(self):
+        self.rounds += 1
+        if self.rounds % self.every == 0:
+            self.write(f"\n--- Round {self.rounds:,} ({time.perf_counter() - self.started:,.1f}s) ---")
+            self.checkpoint()
+
+    def stop(self):
+        self.write(f"\n=== Finished after {self.rounds:,} rounds in {time.perf_counter() - self.started:,.1f}s ===")
+        self.finish()
+        self.report.close()
+
+    def run(self, func, *args, **kwargs):
+        # Profile func; the report is written even if it exits with sys.exit()
+        self.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.stop()
+
+
+class FullProfiler(Profiler):
+    mode = 'full'
+
+    def __init__(self, prefix='blackjack-profile', every=1000):
+        super().__init__(prefix, every)
+        self.profile = cProfile.Profile()
+        self.baseline = None
+        # Leave out the profiler's own allocations
+        self.filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, fnmatch.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ]
+
+    def start(self):
+        super().start()
+        # Filtering matches with fnmatch, which compiles and caches a regex per
+        # pattern; do that now so the cache does not show up as growth
+        for trace_filter in self.filters:
+            fnmatch.fnmatch('', trace_filter.filename_pattern)
+        tracemalloc.start()
+        self.profile.enable()
+
+    def snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(self.filters)
+
+    def round_done(self):
+        if self.baseline is None:
+            self.profile.disable()
+            self.baseline = self.snapshot()
+            self.profile.enable()
+        super().round_done()
+
+    def checkpoint(self):
+        self.profile.disable()  # Keep the snapshot itself out of the profile
+        current, peak = tracemalloc.get_traced_memory()
+        self.write(f"Traced memory: {current / 1024:,.1f} KiB now, {peak / 1024:,.1f} KiB peak")
+        if self.baseline is not None:
+            self.write("Growth since the first round, by line:")
+            for stat in self.snapshot().compare_to(self.baseline, 'lineno')[:TOP]:
+                self.write(f"  {stat}")
+        self.profile.enable()
+
+    def finish(self):
+        self.checkpoint()
+        self.profile.disable()
+        tracemalloc.stop()
+        self.profile.dump_stats(self.prefix + '.prof')
+        for sort, title in (('cumulative', "time including calls"), ('tottime', "own time")):
+            text = io.StringIO()
+            pstats.Stats(self.profile, stream=text).sort_stats(sort).print_stats(TOP)
+            self.write(f"\nHot spots by {title}:")
+            self.write(text.getvalue().strip())
+        self.write(f"\nFull profile saved to {self.prefix}.prof")
+
+
+class SamplingProfiler(Profiler):
+    mode = 'sample'
+
+    def __init__(self, prefix='blackjack-profile', every=1000, interval=SAMPLE_INTERVAL):
+        super().__init__(prefix, every)
+        self.interval = interval
+        self.samples = 0
+        self.own = Counter()  # Samples where the function was running
+        self.inclusive = Counter()  # Samples where it was anywhere on the stack
+        self.thread_id = None
+        self.done = threading.Event()
+        self.thread = None
+        self.switch_interval = None
+
+    def start(self):
+        super().start()
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.switch_interval, self.interval / 2))
+        self.thread_id = threading.get_ident()
+        self.thread = threading.Thread(target=self.sample, name='profile-sampler', daemon=True)
+        self.thread.start()
+
+    def sample(self):
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.own[frame.f_code] += 1
+            seen = set()
+            for _ in range(MAX_STACK_DEPTH):
+                if frame is None:
+                    break
+                seen.add(frame.f_code)
+                frame = frame.f_back
+            self.inclusive.update(seen)
+
+    def checkpoint(self):
+        peak = peak_memory_mb()
+        memory = f"peak memory {peak:,.1f} MiB" if peak is not None else "peak memory not available"
+        elapsed = time.perf_counter() - self.started
+        self.write(f"{self.samples:,} samples ({self.samples / elapsed:,.0f} a second), {memory}")
+
+    def finish(self):
+        self.done.set()
+        self.thread.join()
+        sys.setswitchinterval(self.switch_interval)
+        self.checkpoint()
+        total = self.samples or 1
+        for title, counts in (("running", self.own), ("on the stack", self.inclusive)):
+            self.write(f"\nFunctions by share of samples {title}:")
+            for code, count in counts.most_common(TOP):
+                self.write(f"  {count / total * 100:6.2f}%  {count:>8,}  {describe_code(code)}")
+
+
+PROFILERS = {'full': FullProfiler, 'sample': SamplingProfiler}
+
+
+def open_profiler(mode, prefix='blackjack-profile', every=1000):
+    return PROFILERS[mode](prefix, every)
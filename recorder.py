@@ -0,0 +1,285 @@
+import argparse
+import json
+import os
+import struct
+
+# Binary hand history. The log is a stream of 32-byte records:
+#   H  session header: format version, the table's seed and shoe setup
+#   R  one per round: shoe position, shuffle count, Hi-Lo running count and the dealer's cards
+#   S  one per seat after its round: name and policy ids, final stake, payout, outcome and cards
+#   C  continuation: the cards past the first MAX_CARDS of the R or S record just before it
+# Cards are the engine's single-byte codes. The longest hands that can be dealt
+# are 21 cards for a player (twenty aces and one more card, from a shoe of 5 or
+# more decks) and 17 for the dealer, so a hand never needs more than one C. Moves are not stored, since they
+# follow from the cards: every card after the first two is a hit, except the
+# last one of a doubled hand, and a hand that did not bust or double stood.
+# Player and AI policy names are stored once, in a JSON file next to the log
+# (<log>.names) with a list of each; a seat's name id is its index in the
+# names list, and its policy id its index in the policies list plus one, or 0
+# for a human seat. A round's seats are the S records that follow it.
+# Records are packed into a preallocated block and written a block of rounds
+# at a time (every round when sync is on).
+
+VERSION = 5
+MAGIC = b'BJH'
+RECORD_SIZE = 32
+MAX_CARDS = 16  # Card slots in an R or S record
+BLOCK_SIZE = 1 << 16  # Bytes of records packed before each write
+
+HEADER = struct.Struct('<c3sBBQBxf12x')    # kind, magic, version, flags, seed, decks, penetration
+ROUND = struct.Struct('<cxBBIIH16sh')      # kind, dealer cards, flags, round, shuffles, position, cards, count
+SEAT = struct.Struct('<cBBBIII16s')        # kind, outcome and flags, cards, policy id, name id, bet, payout, cards
+CONTINUATION = struct.Struct('<c31s')      # kind, cards
+CONTINUATION_CARDS = 31
+MAX_HAND_CARDS = MAX_CARDS + CONTINUATION_CARDS
+
+SEEDED = 1       # Header flag: the seed field holds the table's seed
+HEADLESS = 2     # Header flag: an AI-only run_headless session
+RESHUFFLED = 1   # Round flag: the shoe was reshuffled before the deal
+DOUBLED = 0x80   # Seat flag, in the outcome byte: the hand was doubled down
+OUTCOME_MASK = 0x7F
+MAX_POLICIES = 255
+MAX_SEED = (1 << 64) - 1  # Seeds are stored unsigned in the header
+
+OUTCOMES = ('bust', 'dealer_bust', 'win', 'loss', 'push')
+OUTCOME_CODES = {outcome: code for code, outcome in enumerate(OUTCOMES)}
+MAX_CACHED_AMOUNTS = 4096
+
+
+class Cents(dict):
+    # Dollar amount -> whole cents, remembering the amounts seen so far (a
+    # table only ever bets and pays a few), since round() is slow
+    def __missing__(self, amount):
+        cents = round(amount * 100)
+        if len(self) < MAX_CACHED_AMOUNTS:
+            self[amount] = cents
+        return cents
+
+
+def names_path(path):
+    return path + '.names'
+
+
+def load_names(path):
+    # (names, policies) from the log's names file, empty for a new log
+    if not os.path.exists(names_path(path)):
+        return [], []
+    with open(names_path(path), 'r') as f:
+        names = json.load(f)
+    return names['names'], names['policies']
+
+
+class HandRecorder:
+    def __init__(self, path, seed=None, num_decks=0, penetration=0.0, headless=False, sync=True):
+        if seed is not None and not 0 <= seed <= MAX_SEED:
+            raise ValueError(f"Cannot record seed {seed}; seeds must be between 0 and {MAX_SEED}.")
+        self.path = path
+        self.sync = sync  # Flush after every round, so a crash loses nothing
+        self.names, self.policies = load_names(path)
+        self.name_ids = {name: index for index, name in enumerate(self.names)}
+        self.policy_ids = {name: index + 1 for index, name in enumerate(self.policies)}
+        self.names_changed = False
+        self.seat_ids = {}  # name -> (policy, name id, policy id)
+        self.cents = Cents()
+        self.rounds = 0
+        self.block = bytearray(BLOCK_SIZE)
+        self.offset = 0  # Bytes of the block packed so far
+        self.file = open(path, 'ab', buffering=0)
+        flags = (SEEDED if seed is not None else 0) | (HEADLESS if headless else 0)
+        self.file.write(HEADER.pack(b'H', MAGIC, VERSION, flags, seed or 0, num_decks, penetration))
+        self.bytes_written = RECORD_SIZE  # Log records only, not the names file
+
+    def name_id(self, name):
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+            self.names_changed = True
+        return name_id
+
+    def policy_id(self, name):
+        policy_id = self.policy_ids.get(name)
+        if policy_id is None:
+            if len(self.policies) == MAX_POLICIES:
+                raise ValueError(f"Cannot record more than {MAX_POLICIES} policies in one history.")
+            self.policies.append(name)
+            policy_id = self.policy_ids[name] = len(self.policies)
+            self.names_changed = True
+        return policy_id
+
+    def seat_id(self, player):
+        # (policy, name id, policy id) of a seat, cached by name
+        policy = player.policy
+        policy_id = 0 if policy is None else self.policy_ids.get(policy.name) or self.policy_id(policy.name)
+        ids = self.seat_ids[player.name] = (policy, self.name_id(player.name), policy_id)
+        return ids
+
+    def record_round(self, engine, results):
+        # results holds (outcome, payout) for each of engine.players, in order
+        players = engine.players
+        # Room for the round and its seats, each with a continuation at most
+        needed = RECORD_SIZE * 2 * (len(players) + 1)
+        if self.offset + needed > len(self.block):
+            self.write_block()
+            if needed > len(self.block):
+                self.block = bytearray(needed)
+        block = self.block
+        offset = start = self.offset
+        pack_seat = SEAT.pack_into
+        seat_ids = self.seat_ids
+        cents = self.cents
+        dealer = engine.dealer.cards
+        ROUND.pack_into(block, offset, b'R', len(dealer), RESHUFFLED if engine.reshuffled else 0, self.rounds,
+                        engine.deck.shuffles, engine.shoe_position, bytes(dealer), engine.running_count)
+        offset += RECORD_SIZE
+        if len(dealer) > MAX_CARDS:
+            CONTINUATION.pack_into(block, offset, b'C', bytes(dealer[MAX_CARDS:]))
+            offset += RECORD_SIZE
+        for player, (outcome, payout) in zip(players, results):
+            hand = player.hand
+            cards = hand.cards
+            ids = seat_ids.get(player.name)
+            if ids is None or ids[0] is not player.policy:
+                ids = self.seat_id(player)
+            pack_seat(block, offset, b'S', OUTCOME_CODES[outcome] | (DOUBLED if hand.is_doubled else 0), len(cards),
+                      ids[2], ids[1], cents[player.bet], cents[payout], bytes(cards))
+            offset += RECORD_SIZE
+            if len(cards) > MAX_CARDS:
+                CONTINUATION.pack_into(block, offset, b'C', bytes(cards[MAX_CARDS:]))
+                offset += RECORD_SIZE
+        self.offset = offset
+        self.bytes_written += offset - start
+        self.rounds += 1
+        if self.sync:
+            self.flush()
+
+    def write_block(self):
+        if self.offset:
+            self.file.write(memoryview(self.block)[:self.offset])
+            self.offset = 0
+
+    def flush(self):
+        self.write_block()
+        if self.names_changed:
+            temp_path = names_path(self.path) + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump({'names': self.names, 'policies': self.policies}, f)
+            os.replace(temp_path, names_path(self.path))
+            self.names_changed = False
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def derive_moves(num_cards, doubled, outcome):
+    hits = num_cards - 2 - (1 if doubled else 0)
+    if doubled:
+        return 'h' * hits + 'd'
+    return 'h' * hits + ('' if outcome == 'bust' else 's')
+
+
+def read_history(path, chunk_records=4096):
+    # Yield each round as a dict, with the header of the session it belongs to
+    names, policies = load_names(path)
+    session = None
+    sessions = 0
+    current = None
+    hand = []  # Cards of the last R or S record, and how many are still to come in a C
+    missing = 0
+    not_history = f"'{path}' is not a version {VERSION} hand history."
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(RECORD_SIZE * chunk_records)
+            if not data:
+                break
+            if len(data) % RECORD_SIZE:
+                data = data[:len(data) - len(data) % RECORD_SIZE]  # Torn last record
+            for offset in range(0, len(data), RECORD_SIZE):
+                kind = data[offset:offset + 1]
+                if kind != b'H' and session is None:
+                    raise ValueError(not_history)  # Every log starts with a header
+                if missing and kind != b'C':
+                    raise ValueError(f"'{path}' is missing the rest of a hand at byte {f.tell() - len(data) + offset}.")
+                if kind == b'C' and missing:
+                    hand += CONTINUATION.unpack_from(data, offset)[1][:missing]
+                    missing = 0
+                    continue
+                if kind == b'S':
+                    if current is None:
+                        raise ValueError(f"'{path}' has a seat record before any round record.")
+                    _, outcome, count, policy_id, name_id, bet, payout, cards = SEAT.unpack_from(data, offset)
+                    doubled = bool(outcome & DOUBLED)
+                    outcome = OUTCOMES[outcome & OUTCOME_MASK]
+                    hand = list(cards[:count])
+                    missing = count - len(hand)
+                    current['seats'].append({
+                        'name': names[name_id] if name_id < len(names) else f"#{name_id}",
+                        'policy': (policies[policy_id - 1] if policy_id <= len(policies) else f"#{policy_id - 1}")
+                                  if policy_id else None,
+                        'cards': hand,
+                        'bet': bet / 100,
+                        'payout': payout / 100,
+                        'outcome': outcome,
+                        'doubled': doubled,
+                        'moves': derive_moves(count, doubled, outcome),
+                    })
+                    continue
+                if current is not None:
+                    yield current
+                    current = None
+                if kind == b'R':
+                    _, count, flags, number, shuffles, position, cards, running = ROUND.unpack_from(data, offset)
+                    decks_left = session['decks'] - position / 52
+                    hand = list(cards[:count])
+                    missing = count - len(hand)
+                    current = {
+                        'round': number, 'session': session, 'shuffles': shuffles, 'position': position,
+                        'reshuffled': bool(flags & RESHUFFLED), 'dealer': hand, 'seats': [],
+                        'running_count': running, 'true_count': running / decks_left if decks_left > 0 else 0.0,
+                    }
+                elif kind == b'H':
+                    _, magic, version, flags, seed, num_decks, penetration = HEADER.unpack_from(data, offset)
+                    if magic != MAGIC or version != VERSION:
+                        raise ValueError(not_history)
+                    session = {
+                        'number': sessions, 'seed': seed if flags & SEEDED else None, 'headless': bool(flags & HEADLESS),
+                        'decks': num_decks, 'penetration': round(penetration, 4),
+                    }
+                    sessions += 1
+                else:
+                    raise ValueError(f"'{path}' has an unknown record at byte {f.tell() - len(data) + offset}.")
+    if current is not None:
+        yield current
+
+
+def main(argv=None):
+    from BJ import Card
+    parser = argparse.ArgumentParser(description="Show a binary hand history")
+    parser.add_argument('path')
+    parser.add_argument('--show', type=int, default=5, metavar='N', help="print the last N rounds (default: 5)")
+    args = parser.parse_args(argv)
+
+    rounds = hands = 0
+    last = []
+    for round_data in read_history(args.path):
+        rounds += 1
+        hands += len(round_data['seats'])
+        last.append(round_data)
+        if len(last) > args.show:
+            last.pop(0)
+    cards = lambda codes: ' '.join(str(Card.from_code(code)) for code in codes)
+    for round_data in last:
+        print(f"Round {round_data['round']} (seed {round_data['session']['seed']}, shoe {round_data['shuffles']} "
+              f"card {round_data['position']}, count {round_data['running_count']:+d}/{round_data['true_count']:+.1f}): "
+              f"dealer {cards(round_data['dealer'])}")
+        for seat in round_data['seats']:
+            name = f"{seat['name']} ({seat['policy']})" if seat['policy'] else seat['name']
+            print(f"  {name}: {cards(seat['cards'])}  moves {seat['moves'] or '-'}  "
+                  f"bet ${seat['bet']:,.2f}  {seat['outcome']}  paid ${seat['payout']:,.2f}")
+    size = os.path.getsize(args.path)
+    print(f"{rounds:,} rounds, {hands:,} hands, {size:,} bytes ({size / hands if hands else 0:.1f} bytes/hand)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+from itertools import islice
+
+from BJ import HIGH_WIN_BALANCE, STARTING_BALANCE, Colors, Deck, RoundEngine, Seat, ai_names, run_headless
+from policies import POLICIES
+from recorder import read_history
+
+# Replays recorded sessions from a hand history (see recorder.py).
+#
+# Shoe replay deals every round again from the recorded cards, plays the
+# recorded bets and moves through the RoundEngine, and checks every outcome
+# and payout. Seed replay (--rerun) shuffles a new shoe from each session's
+# seed and checks that it deals the same cards. Headless sessions are played
+# again from the seed and the seats' recorded policies, AI decisions included, and their final balances
+# and leaderboard are compared with the recording; other sessions replay the
+# recorded bets and moves on the reshuffled shoe.
+
+REPLAY_BALANCE = 10 ** 9  # Large enough that a recorded double is never refused
+MAX_MISMATCHES = 20  # Mismatches kept for the report
+
+
+def shoe_order(round_data):
+    # The recorded cards in the order the engine deals them
+    seats = round_data['seats']
+    order = []
+    for seat in seats:
+        order += seat['cards'][:2]
+    order += round_data['dealer'][:2]
+    for seat in seats:
+        order += seat['cards'][2:]
+    order += round_data['dealer'][2:]
+    return order
+
+
+class ReplayShoe:
+    # Stands in for Deck, dealing one round's recorded cards at a time
+    def __init__(self):
+        self.cards = []
+        self.position = 0
+        self.shuffles = 0
+        self.reshuffled = False
+        self.running_count = 0
+        self.true_count = 0.0
+
+    def load(self, round_data):
+        self.cards = shoe_order(round_data)
+        self.position = 0
+        self.shuffles = round_data['shuffles']
+        self.reshuffled = round_data['reshuffled']
+        self.running_count = round_data['running_count']
+        self.true_count = round_data['true_count']
+
+    def reshuffle_if_needed(self):
+        return self.reshuffled
+
+    def deal_card(self):
+        if self.position == len(self.cards):
+            raise ValueError("the round drew more cards than were recorded")
+        self.position += 1
+        return self.cards[self.position - 1]
+
+
+def replay_round(deck, round_data):
+    # Play one recorded round again with the recorded bets and moves, dealing
+    # from deck; returns a list of mismatch descriptions
+    seats = round_data['seats']
+    players = [Seat(seat['name'], REPLAY_BALANCE, is_ai=True) for seat in seats]
+    engine = RoundEngine(deck, players)
+    problems = []
+    try:
+        engine.deal()
+        for player, seat in zip(players, seats):
+            # The recorded bet is the final stake, after any double down
+            engine.place_bet(player, seat['bet'] / 2 if seat['doubled'] else seat['bet'])
+            moves = iter(seat['moves'])
+            engine.play_turn(player, lambda player: next(moves, 's'))
+            if next(moves, None) is not None:
+                problems.append(f"{seat['name']}: the turn ended before the recorded moves did")
+        dealer_value, dealer_bust = engine.play_dealer()
+    except ValueError as error:
+        return [str(error)]
+    if engine.dealer.cards != round_data['dealer']:
+        problems.append("the dealer's cards differ")
+    for player, seat in zip(players, seats):
+        if player.hand.cards != seat['cards']:
+            problems.append(f"{seat['name']}: the cards differ")
+        outcome, payout = engine.settle(player, dealer_value, dealer_bust)
+        if outcome != seat['outcome'] or round(payout * 100) != round(seat['payout'] * 100):
+            problems.append(f"{seat['name']}: replayed {outcome} paying ${payout:,.2f}, "
+                            f"recorded {seat['outcome']} paying ${seat['payout']:,.2f}")
+    engine.finish()
+    return problems
+
+
+def replay_history(path):
+    # Shoe replay of every round; returns a report dict
+    shoe = ReplayShoe()
+    report = {'rounds': 0, 'hands': 0, 'mismatched_rounds': 0, 'mismatches': [], 'net': {}, 'leaderboard': {}}
+    net = report['net']
+    leaderboard = report['leaderboard']
+    for round_data in read_history(path):
+        shoe.load(round_data)
+        problems = replay_round(shoe, round_data)
+        if problems:
+            report['mismatched_rounds'] += 1
+            for problem in problems:
+                if len(report['mismatches']) < MAX_MISMATCHES:
+                    report['mismatches'].append(f"round {round_data['round']}: {problem}")
+        for seat in round_data['seats']:
+            gain = seat['payout'] - seat['bet']
+            net[seat['name']] = net.get(seat['name'], 0) + gain
+            if seat['outcome'] in ('dealer_bust', 'win'):
+                leaderboard[seat['name']] = leaderboard.get(seat['name'], 0) + gain
+        report['rounds'] += 1
+        report['hands'] += len(round_data['seats'])
+    return report
+
+
+def headless_totals(rounds):
+    # Final balances and leaderboard of a headless session, from its records,
+    # with the same rebuy and high-win rules as run_headless
+    balances = {}
+    leaderboard = {}
+    for round_data in rounds:
+        for seat in round_data['seats']:
+            name = seat['name']
+            gain = seat['payout'] - seat['bet']
+            if seat['outcome'] in ('dealer_bust', 'win'):
+                leaderboard[name] = leaderboard.get(name, 0) + gain
+            balance = balances.get(name, STARTING_BALANCE) + gain
+            if balance > HIGH_WIN_BALANCE:
+                leaderboard.pop(name, None)
+                balance = STARTING_BALANCE
+            elif balance <= 0:
+                balance = STARTING_BALANCE
+            balances[name] = balance
+    return balances, leaderboard
+
+
+def same_round(recorded, replayed):
+    keys = ('shuffles', 'position', 'reshuffled', 'running_count', 'dealer', 'seats')
+    return all(recorded[key] == replayed[key] for key in keys)
+
+
+def session_rounds(path, number):
+    return (round_data for round_data in read_history(path) if round_data['session']['number'] == number)
+
+
+def rerun_headless(path, session, rounds, policies):
+    # Play the whole session again from its seed, AI decisions included
+    problems = []
+    with tempfile.TemporaryDirectory() as folder:
+        record = os.path.join(folder, 'rerun.bjh')
+        stats = run_headless(rounds, len(policies), session['decks'], session['penetration'], session['seed'],
+                             record=record, policies=policies)
+        for recorded, replayed in zip(session_rounds(path, session['number']), read_history(record)):
+            if not same_round(recorded, replayed):
+                return [f"round {recorded['round']} was dealt or played differently"]
+    balances, leaderboard = headless_totals(session_rounds(path, session['number']))
+    if balances != stats['balances']:
+        problems.append("final balances differ")
+    if leaderboard != stats['leaderboard']:
+        problems.append("leaderboard totals differ")
+    return problems
+
+
+def rerun_shoe(path, session):
+    # Shuffle a new shoe from the seed and play the recorded bets and moves on it
+    deck = Deck(session['decks'], session['penetration'], rng=random.Random(session['seed']))
+    for round_data in session_rounds(path, session['number']):
+        problems = replay_round(deck, round_data)
+        if problems:
+            return [f"round {round_data['round']}: {problem}" for problem in problems]
+    return []
+
+
+def rerun_history(path):
+    # Seed replay of every session; returns one report per session
+    sessions = []
+    for round_data in read_history(path):
+        session = round_data['session']
+        if not sessions or sessions[-1]['session']['number'] != session['number']:
+            sessions.append({'session': session, 'rounds': 0, 'names': [seat['name'] for seat in round_data['seats']],
+                             'policies': [seat['policy'] for seat in round_data['seats']]})
+        sessions[-1]['rounds'] += 1
+
+    reports = []
+    for entry in sessions:
+        session = entry['session']
+        report = {'session': session['number'], 'seed': session['seed'], 'rounds': entry['rounds'], 'problems': []}
+        num_ai = len(entry['names'])
+        if session['seed'] is None:
+            report['problems'] = ["no seed was recorded, so it can only be replayed from its shoe"]
+        elif (session['headless'] and entry['names'] == list(islice(ai_names(), num_ai))
+              and all(policy in POLICIES for policy in entry['policies'])):
+            report['problems'] = rerun_headless(path, session, entry['rounds'], entry['policies'])
+        else:
+            report['problems'] = rerun_shoe(path, session)
+        reports.append(report)
+    return reports
+
+
+def print_replay_report(report):
+    print(Colors.HEADER + "=== Shoe Replay ===" + Colors.END)
+    print(f"Rounds: {report['rounds']:,}  Hands: {report['hands']:,}  "
+          f"Mismatched rounds: {report['mismatched_rounds']:,}")
+    for problem in report['mismatches']:
+        print(Colors.RED + problem + Colors.END)
+    for name, amount in report['net'].items():
+        print(f"{name} - net ${amount:,.2f}, leaderboard gains ${report['leaderboard'].get(name, 0):,.2f}")
+    if not report['mismatched_rounds']:
+        print(Colors.GREEN + "Every outcome and payout matches the recording." + Colors.END)
+
+
+def print_rerun_reports(reports):
+    print(Colors.HEADER + "=== Seed Replay ===" + Colors.END)
+    for report in reports:
+        if report['problems']:
+            status = Colors.RED + '; '.join(report['problems']) + Colors.END
+        else:
+            status = Colors.GREEN + "identical cards and payouts" + Colors.END
+        print(f"Session {report['session']} (seed {report['seed']}, {report['rounds']:,} rounds): {status}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded hand history and check it")
+    parser.add_argument('path', help="hand history written with --record")
+    parser.add_argument('--rerun', action='store_true',
+                        help="also replay every seeded session from its seed")
+    args = parser.parse_args(argv)
+
+    report = replay_history(args.path)
+    print_replay_report(report)
+    failed = report['mismatched_rounds'] > 0
+    if args.rerun:
+        reports = rerun_history(args.path)
+        print_rerun_reports(reports)
+        failed = failed or any(report['problems'] for report in reports)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
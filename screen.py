@@ -0,0 +1,94 @@
+import os
+import re
+import shutil
+import unicodedata
+
+# Frame renderer for the interactive game on a terminal. Everything written
+# between two new_frame() calls is one frame (a screen). Writes are kept in a
+# buffer and reach the terminal when the frame is flushed: before a pause,
+# before asking for input and before the next frame starts. Each flush
+# compares the frame with the lines already on screen and sends only the
+# lines that changed, placed with ANSI cursor movement, in a single write.
+#
+# Line positions are only known while the frame fits the terminal. A frame
+# taller than the terminal, or with a line wider than it, is drawn in full on
+# a cleared screen, and so is the frame after it.
+
+ANSI_CODE = re.compile(r'\033\[[0-9;?]*[A-Za-z]')
+CLEAR_SCREEN = '\033[H\033[2J'
+CLEAR_LINE = '\033[K'  # From the cursor to the end of the line
+CLEAR_BELOW = '\033[J'  # From the cursor to the end of the screen
+
+
+def visible_width(line):
+    # Columns a line takes on screen: colour codes take none, wide characters two
+    line = ANSI_CODE.sub('', line)
+    if line.isascii():
+        return len(line)
+    return sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in line)
+
+
+def move_to(row):
+    return f'\033[{row + 1}H'
+
+
+class FrameRenderer:
+    def __init__(self, stream):
+        self.stream = stream
+        self.frame = []  # Text written to the current frame
+        self.shown = None  # The text on screen, written from the top left; None before the first flush
+        self.redraw = True  # Rows on screen may not match the lines of shown
+        self.flushes = 0  # Flushes that wrote something
+        if os.name == 'nt':
+            os.system('')  # Turns on ANSI escape codes in the Windows console
+
+    def write(self, text):
+        self.frame.append(text)
+        return len(text)
+
+    def flush(self):
+        self.present()
+        self.stream.flush()
+
+    def new_frame(self):
+        self.present()
+        self.frame = []
+
+    def ask(self, prompt):
+        # input() with the prompt drawn as part of the frame. The terminal
+        # echoes the answer and the Enter after it, so they go into the frame
+        # as already shown.
+        self.write(prompt)
+        self.flush()
+        answer = input()
+        self.frame.append(answer + '\n')
+        self.shown = ''.join(self.frame)
+        return answer
+
+    def present(self):
+        text = ''.join(self.frame)
+        shown = self.shown
+        if text == shown:
+            return
+        lines = text.split('\n')
+        columns, rows = shutil.get_terminal_size()
+        fits = len(lines) <= rows and all(visible_width(line) < columns for line in lines)
+        appended = shown is not None and text.startswith(shown)
+        if appended:
+            # The frame has only grown since the last flush: write the rest
+            # where the cursor already is, as plain output would
+            output = text[len(shown):]
+        elif self.redraw or not fits:
+            output = CLEAR_SCREEN + text
+        else:
+            # Unchanged lines are skipped; the last line is always written,
+            # since it leaves the cursor at the end of the frame
+            shown = shown.split('\n')
+            last = len(lines) - 1
+            output = [f'{move_to(row)}{line}{CLEAR_LINE}' for row, line in enumerate(lines)
+                      if row == last or row >= len(shown) or shown[row] != line]
+            output = ''.join(output) + CLEAR_BELOW
+        self.stream.write(output)
+        self.flushes += 1
+        self.shown = text
+        self.redraw = not fits or appended and self.redraw
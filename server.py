@@ -0,0 +1,313 @@
+import argparse
+import asyncio
+import random
+import time
+
+from BJ import (
+    DEFAULT_NUM_DECKS, DEFAULT_PENETRATION, MAX_DECKS, MIN_DECKS, STARTING_BALANCE,
+    Card, Deck, RoundEngine, Seat, ai_names, max_seats, new_seed, seat_policies,
+)
+from policies import DEFAULT_POLICY, POLICIES
+
+# Multi-table server. One asyncio process hosts many independent tables; each
+# table has its own shoe, dealer and seats, and its own task. Human players
+# connect over TCP or a Unix socket and play with a line-based protocol, while
+# AI seats are played in-process. A table with no humans seated just waits on
+# an event, so idle tables cost next to nothing.
+#
+# Protocol (one command per line):
+#   client: JOIN <table> <name>       server: WELCOME <table> <balance>
+#   server: HAND <cards> VALUE <v> DEALER <upcard>
+#   server: BET? <balance>            client: BET <amount> | QUIT
+#   server: MOVE?                     client: h | s | d | QUIT
+#   server: EVENT <text>, DEALER <cards> VALUE <v>,
+#           RESULT <outcome> <winnings> BALANCE <balance>, ERROR <text>, BYE
+
+DEFAULT_PORT = 8765
+DECISION_TIMEOUT = 60  # Seconds a human gets for each bet or move
+
+
+def format_cards(cards):
+    return ' '.join(str(Card.from_code(card)) for card in cards)
+
+
+class Connection:
+    def __init__(self, reader, writer, name):
+        self.reader = reader
+        self.writer = writer
+        self.name = name
+        self.closed = asyncio.Event()
+
+    async def send(self, line):
+        if self.closed.is_set():
+            return
+        try:
+            self.writer.write((line + '\n').encode('utf-8'))
+            await self.writer.drain()
+        except (ConnectionError, OSError):
+            self.close()
+
+    async def ask(self, line):
+        # Send a prompt and wait for the answer; None if the player left
+        await self.send(line)
+        if self.closed.is_set():
+            return None
+        try:
+            data = await asyncio.wait_for(self.reader.readline(), DECISION_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            data = b''
+        answer = data.decode('utf-8', 'replace').strip()
+        if not answer or answer.upper() == 'QUIT':
+            self.close()
+            return None
+        return answer
+
+    def close(self):
+        if not self.closed.is_set():
+            self.closed.set()
+            self.writer.close()
+
+
+class Table:
+    def __init__(self, table_id, num_ai=3, num_decks=DEFAULT_NUM_DECKS, penetration=DEFAULT_PENETRATION, seed=None,
+                 policies=None):
+        if num_ai > max_seats(num_decks):
+            raise ValueError(f"A {num_decks}-deck shoe can deal at most {max_seats(num_decks)} seats.")
+        self.table_id = table_id
+        self.seed = new_seed() if seed is None else seed
+        self.deck = Deck(num_decks, penetration, rng=random.Random(self.seed))
+        self.players = [Seat(name, is_ai=True, policy=policy)
+                        for name, policy in zip(ai_names(), seat_policies(policies, num_ai, num_decks))]
+        self.connections = {}  # Human player name -> Connection
+        self.leaderboard = {}
+        self.rounds = 0
+        self.round_time = 0.0  # Total seconds spent playing rounds
+        self.wake = asyncio.Event()
+
+    def join(self, connection):
+        # Seats the player, or says why they can't sit down
+        if len(self.players) >= max_seats(self.deck.num_decks):
+            return "table is full"
+        if any(player.name == connection.name for player in self.players):
+            return "name already taken at this table"
+        self.players.append(Seat(connection.name))
+        self.connections[connection.name] = connection
+        self.wake.set()
+        return None
+
+    def leave(self, name):
+        self.players = [player for player in self.players if player.name != name]
+        connection = self.connections.pop(name, None)
+        if connection:
+            connection.close()
+
+    async def broadcast(self, line):
+        for connection in list(self.connections.values()):
+            await connection.send(line)
+
+    async def run(self):
+        while True:
+            if not self.connections:
+                self.wake.clear()
+                await self.wake.wait()
+            start = time.perf_counter()
+            await self.play_round()
+            self.round_time += time.perf_counter() - start
+            self.rounds += 1
+            await asyncio.sleep(0)  # Let the other tables run
+
+    async def play_round(self):
+        engine = RoundEngine(self.deck, list(self.players))
+        dealer = engine.deal()
+        upcard_text = str(Card.from_code(dealer.cards[0]))
+        engine.place_ai_bets()
+        first_moves = dict(zip(map(id, engine.ai_players), engine.first_moves()))
+
+        for player in engine.players:
+            hand = player.hand
+            if player.is_ai:
+                event = engine.play_ai_turn(player, first_moves[id(player)])
+                await self.broadcast(f"EVENT {player.name} {event} {format_cards(hand.cards)}")
+                continue
+            connection = self.connections.get(player.name)
+            await connection.send(f"HAND {format_cards(hand.cards)} VALUE {hand.value} DEALER {upcard_text}")
+            engine.place_bet(player, await self.ask_bet(connection, player.balance))
+            while True:
+                move = await connection.ask("MOVE?")
+                if move not in ('h', 's', 'd'):
+                    if move is not None:
+                        await connection.send("ERROR moves are h, s or d")
+                        continue
+                    move = 's'  # A player who left stands
+                event = engine.apply_move(player, move)
+                await connection.send(f"HAND {format_cards(hand.cards)} VALUE {hand.value} DEALER {upcard_text}")
+                if event == 'no_double':
+                    await connection.send("ERROR cannot double down")
+                elif event in RoundEngine.TURN_OVER:
+                    break
+
+        dealer_value, dealer_bust = engine.play_dealer()
+        await self.broadcast(f"DEALER {format_cards(dealer.cards)} VALUE {dealer_value}")
+        for player in engine.players:
+            bet = player.bet
+            outcome, winnings = engine.settle(player, dealer_value, dealer_bust)
+            if outcome in ('dealer_bust', 'win'):
+                self.leaderboard[player.name] = self.leaderboard.get(player.name, 0) + winnings - bet
+            connection = self.connections.get(player.name)
+            if connection:
+                await connection.send(f"RESULT {outcome} {winnings} BALANCE {player.balance}")
+        engine.finish()
+
+        for player in list(self.players):
+            connection = self.connections.get(player.name)
+            if player.is_ai:
+                if player.balance <= 0:
+                    player.balance = STARTING_BALANCE  # AI seats buy back in
+            elif connection is None or connection.closed.is_set() or player.balance <= 0:
+                if connection:
+                    await connection.send("BYE")
+                self.leave(player.name)
+
+    async def ask_bet(self, connection, balance):
+        while True:
+            answer = await connection.ask(f"BET? {balance}")
+            if answer is None:
+                return 0  # Left before betting: sit the round out
+            parts = answer.split()
+            try:
+                bet = float(parts[1]) if len(parts) == 2 and parts[0].upper() == 'BET' else float(answer)
+            except ValueError:
+                bet = 0
+            if 0 < bet <= balance:
+                return bet
+            await connection.send("ERROR invalid bet amount")
+
+
+class BlackjackServer:
+    def __init__(self, tables=100, ai_per_table=3, num_decks=DEFAULT_NUM_DECKS, penetration=DEFAULT_PENETRATION,
+                 seed=None, policies=None):
+        # Each table's seed comes from the server seed, so one number replays them all
+        self.seed = new_seed() if seed is None else seed
+        rng = random.Random(self.seed)
+        self.tables = [Table(table_id, ai_per_table, num_decks, penetration, rng.getrandbits(63), policies)
+                       for table_id in range(tables)]
+        self.tasks = []
+
+    async def handle_client(self, reader, writer):
+        try:
+            line = await asyncio.wait_for(reader.readline(), DECISION_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            writer.close()
+            return
+        parts = line.decode('utf-8', 'replace').split(maxsplit=2)
+        if len(parts) != 3 or parts[0].upper() != 'JOIN' or not parts[1].isdigit() \
+                or int(parts[1]) >= len(self.tables):
+            writer.write(f"ERROR expected JOIN <0-{len(self.tables) - 1}> <name>\n".encode('utf-8'))
+            writer.close()
+            return
+        table = self.tables[int(parts[1])]
+        connection = Connection(reader, writer, parts[2].strip())
+        error = table.join(connection)
+        if error:
+            await connection.send(f"ERROR {error}")
+            connection.close()
+            return
+        await connection.send(f"WELCOME {table.table_id} {STARTING_BALANCE}")
+        # The table does all reading from here on
+        await connection.closed.wait()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT, unix_path=None):
+        self.tasks = [asyncio.create_task(table.run()) for table in self.tables]
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_client, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+# Local client stub: a bot that joins a table and plays hit-below-17 with flat bets
+async def run_bot(table, name, rounds, host='127.0.0.1', port=DEFAULT_PORT, unix_path=None, bet=10):
+    if unix_path:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"JOIN {table} {name}\n".encode('utf-8'))
+    played = 0
+    latencies = []
+    round_start = time.perf_counter()
+    value = 0
+    while played < rounds:
+        line = (await reader.readline()).decode('utf-8').strip()
+        if not line or line == 'BYE' or (line.startswith('ERROR') and 'JOIN' in line):
+            break
+        if line.startswith('HAND'):
+            value = int(line.split(' VALUE ')[1].split()[0])
+        elif line.startswith('BET?'):
+            writer.write(f"BET {bet}\n".encode('utf-8'))
+        elif line == 'MOVE?':
+            writer.write(b"h\n" if value < 17 else b"s\n")
+        elif line.startswith('RESULT'):
+            now = time.perf_counter()
+            latencies.append(now - round_start)
+            round_start = now
+            played += 1
+    writer.write(b"QUIT\n")
+    writer.close()
+    return latencies
+
+
+async def run_bots(clients, rounds, tables, host, port, unix_path):
+    results = await asyncio.gather(*(
+        run_bot(index % tables, f"Bot{index}", rounds, host, port, unix_path) for index in range(clients)))
+    latencies = sorted(latency for result in results for latency in result)
+    if latencies:
+        print(f"{clients} client(s), {len(latencies)} rounds: "
+              f"median round {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-table Blackjack server")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve = subparsers.add_parser('serve', help="host tables")
+    serve.add_argument('--tables', type=int, default=100)
+    serve.add_argument('--ai-players', type=int, default=3, help="AI seats per table")
+    serve.add_argument('--decks', type=int, default=DEFAULT_NUM_DECKS, choices=range(MIN_DECKS, MAX_DECKS + 1),
+                       metavar=f"{MIN_DECKS}-{MAX_DECKS}")
+    serve.add_argument('--penetration', type=float, default=DEFAULT_PENETRATION,
+                       help="fraction of each shoe dealt before reshuffling")
+    serve.add_argument('--seed', type=int, default=None, help="server seed that every table's seed is drawn from")
+    serve.add_argument('--policy', nargs='+', choices=sorted(POLICIES), default=[DEFAULT_POLICY], metavar='NAME',
+                       help="AI policy for each table's seats, handed out in turn")
+    client = subparsers.add_parser('client', help="run bot clients against a server")
+    client.add_argument('--clients', type=int, default=1)
+    client.add_argument('--rounds', type=int, default=10, help="rounds per client")
+    client.add_argument('--tables', type=int, default=1, help="spread clients over this many tables")
+    for sub in (serve, client):
+        sub.add_argument('--host', default='127.0.0.1')
+        sub.add_argument('--port', type=int, default=DEFAULT_PORT)
+        sub.add_argument('--unix', default=None, metavar='PATH', help="use a Unix socket instead of TCP")
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        if args.tables < 1:
+            serve.error("--tables must be at least 1")
+        if not 0 < args.penetration <= 1:
+            serve.error("--penetration must be greater than 0 and at most 1")
+        # Leave at least one seat at each table for a player
+        if not 0 <= args.ai_players < max_seats(args.decks):
+            serve.error(f"--ai-players must be between 0 and {max_seats(args.decks) - 1} for a {args.decks}-deck shoe")
+        server = BlackjackServer(args.tables, args.ai_players, args.decks, args.penetration, args.seed, args.policy)
+        where = args.unix or f"{args.host}:{args.port}"
+        print(f"Hosting {args.tables} tables on {where} (seed {server.seed})")
+        try:
+            asyncio.run(server.serve(args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+    else:
+        asyncio.run(run_bots(args.clients, args.rounds, args.tables, args.host, args.port, args.unix))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import argparse
+import time
+
+import numpy as np
+
+from BJ import (
+    CARD_VALUES, DEFAULT_NUM_DECKS, DEFAULT_PENETRATION, MIN_DECKS, MAX_DECKS,
+    Colors, run_headless,
+)
+from policies import BET_UNIT
+
+# Batch Monte Carlo simulator for the AI and dealer policies.
+# Every hand is one row of cards cut from a freshly shuffled shoe, and the
+# hit/stand rules are applied to all rows at once with NumPy masks.
+
+DEALER_STANDS_ON = 17
+MAX_THRESHOLD = 21
+# Every card is at least 1, so a hand that hits below 21 holds at most 20
+# cards before its last one, and the dealer, who hits 16 or less, at most 16
+MAX_PLAYER_CARDS = MAX_THRESHOLD
+MAX_DEALER_CARDS = DEALER_STANDS_ON
+ROW_CARDS = MAX_PLAYER_CARDS + MAX_DEALER_CARDS  # Cards set aside for each simulated hand; no row can run out
+CHUNK_SIZE = 250_000  # Hands simulated per batch, to keep memory flat
+
+
+def deal_rows(rng, hands, num_decks=DEFAULT_NUM_DECKS, penetration=DEFAULT_PENETRATION):
+    # Hard card values (aces count 1) for each hand, taken from the part of
+    # each shuffled shoe in front of the cut card
+    shoe = np.array([1 if value == 11 else value for value in CARD_VALUES] * num_decks, dtype=np.int8)
+    usable = max(ROW_CARDS, int(len(shoe) * penetration))
+    rows_per_shoe = min(usable, len(shoe)) // ROW_CARDS
+    shoes = -(-hands // rows_per_shoe)
+    shuffled = rng.permuted(np.tile(shoe, (shoes, 1)), axis=1)
+    rows = shuffled[:, :rows_per_shoe * ROW_CARDS].reshape(-1, ROW_CARDS)
+    return rows[:hands]
+
+
+def hand_values(hard, has_ace):
+    # Count one ace as 11 when it doesn't bust the hand
+    soft = has_ace & (hard + 10 <= 21)
+    return np.where(soft, hard + 10, hard), soft
+
+
+def draw(rows, positions, hard, has_ace, mask):
+    # Give the next card of its row to every hand selected by mask
+    idx = np.nonzero(mask)[0]
+    cols = positions[idx]
+    assert cols.max() < ROW_CARDS, "a row ran out of cards"
+    cards = rows[idx, cols]
+    hard[idx] += cards
+    has_ace[idx] |= cards == 1
+    positions[idx] += 1
+
+
+def play_batch(rows, threshold, hit_soft_17=False, blackjack_payout=None):
+    # Returns the result of each hand in units of the bet: 1 win, 0 push, -1 loss
+    # (or blackjack_payout for a natural when naturals are paid separately)
+    n = len(rows)
+    rows = rows.astype(np.int16)
+    positions = np.full(n, 4, dtype=np.int16)
+
+    # Cards are dealt in the same order as RoundEngine.deal: player, player, dealer, dealer
+    player_hard = rows[:, 0] + rows[:, 1]
+    player_ace = (rows[:, 0] == 1) | (rows[:, 1] == 1)
+    dealer_hard = rows[:, 2] + rows[:, 3]
+    dealer_ace = (rows[:, 2] == 1) | (rows[:, 3] == 1)
+    player_natural = player_ace & (player_hard == 11)
+    dealer_natural = dealer_ace & (dealer_hard == 11)
+
+    # Player: hit while the value is below the threshold
+    player_value, _ = hand_values(player_hard, player_ace)
+    active = player_value < threshold
+    while active.any():
+        draw(rows, positions, player_hard, player_ace, active)
+        player_value, _ = hand_values(player_hard, player_ace)
+        active &= player_value < threshold
+    player_bust = player_value > 21
+
+    # Dealer: hit below 17, optionally also on soft 17
+    dealer_value, dealer_soft = hand_values(dealer_hard, dealer_ace)
+    active = ~player_bust
+    while True:
+        needs_card = dealer_value < DEALER_STANDS_ON
+        if hit_soft_17:
+            needs_card |= (dealer_value == DEALER_STANDS_ON) & dealer_soft
+        active &= needs_card
+        if not active.any():
+            break
+        draw(rows, positions, dealer_hard, dealer_ace, active)
+        dealer_value, dealer_soft = hand_values(dealer_hard, dealer_ace)
+    dealer_bust = dealer_value > 21
+
+    result = np.where(player_value > dealer_value, 1.0, np.where(player_value < dealer_value, -1.0, 0.0))
+    result[dealer_bust] = 1.0
+    result[player_bust] = -1.0
+    if blackjack_payout is not None:
+        # Naturals are settled before anyone acts
+        result[dealer_natural & ~player_natural] = -1.0
+        result[player_natural & ~dealer_natural] = blackjack_payout
+        result[player_natural & dealer_natural] = 0.0
+    return result
+
+
+def simulate(hands, thresholds=(17,), num_decks=DEFAULT_NUM_DECKS, penetration=DEFAULT_PENETRATION,
+             hit_soft_17=False, blackjack_payout=None, seed=None, chunk_size=CHUNK_SIZE):
+    # Every threshold plays the same cards, so differences between policies
+    # aren't drowned out by dealing noise
+    if not MIN_DECKS <= num_decks <= MAX_DECKS:
+        raise ValueError(f"Number of decks must be between {MIN_DECKS} and {MAX_DECKS}.")
+    if not all(2 <= threshold <= MAX_THRESHOLD for threshold in thresholds):
+        raise ValueError(f"Thresholds must be between 2 and {MAX_THRESHOLD}.")
+    rng = np.random.default_rng(seed)
+    totals = {threshold: [0, 0, 0, 0.0] for threshold in thresholds}  # wins, losses, pushes, units won
+    remaining = hands
+    while remaining > 0:
+        batch = min(chunk_size, remaining)
+        rows = deal_rows(rng, batch, num_decks, penetration)
+        for threshold in thresholds:
+            result = play_batch(rows, threshold, hit_soft_17, blackjack_payout)
+            counts = totals[threshold]
+            counts[0] += int(np.count_nonzero(result > 0))
+            counts[1] += int(np.count_nonzero(result < 0))
+            counts[2] += int(np.count_nonzero(result == 0))
+            counts[3] += float(result.sum())
+        remaining -= batch
+    return [
+        {
+            'threshold': threshold,
+            'hands': hands,
+            'win_rate': wins / hands,
+            'loss_rate': losses / hands,
+            'push_rate': pushes / hands,
+            'ev': units / hands,
+        }
+        for threshold, (wins, losses, pushes, units) in totals.items()
+    ]
+
+
+def scalar_rates(rounds, num_decks=DEFAULT_NUM_DECKS, penetration=DEFAULT_PENETRATION, seed=None):
+    # The same numbers from the scalar engine: one AI seat on the threshold
+    # policy, which hits below 17 and bets a flat BET_UNIT
+    stats = run_headless(rounds, 1, num_decks, penetration, seed=seed, policies=['threshold'])
+    hands = stats['hands']
+    return {
+        'threshold': 17,
+        'hands': hands,
+        'win_rate': stats['wins'] / hands,
+        'loss_rate': stats['losses'] / hands,
+        'push_rate': stats['pushes'] / hands,
+        'ev': sum(stats['net'].values()) / BET_UNIT / hands,
+    }
+
+
+def rate_z_scores(scalar, vector):
+    # z score of the difference between the scalar and vectorized estimate of each rate
+    scores = {}
+    for key in ('win_rate', 'loss_rate', 'push_rate'):
+        p = vector[key]
+        se = (p * (1 - p) / scalar['hands'] + p * (1 - p) / vector['hands']) ** 0.5
+        scores[key] = (scalar[key] - p) / se if se else 0.0
+    return scores
+
+
+def print_results(results):
+    print(Colors.HEADER + "=== Policy Results ===" + Colors.END)
+    for result in results:
+        print(f"Hit below {result['threshold']:>2}: win {result['win_rate']:.4f}  "
+              f"loss {result['loss_rate']:.4f}  push {result['push_rate']:.4f}  EV {result['ev']:+.4f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized Blackjack policy simulator")
+    parser.add_argument('--hands', type=int, default=1_000_000, help="hands to simulate per policy")
+    parser.add_argument('--thresholds', type=int, nargs='+', default=[17], choices=range(2, MAX_THRESHOLD + 1),
+                        metavar=f"2-{MAX_THRESHOLD}", help="player hits below each of these totals (default: 17)")
+    parser.add_argument('--decks', type=int, default=DEFAULT_NUM_DECKS, choices=range(MIN_DECKS, MAX_DECKS + 1),
+                        metavar=f"{MIN_DECKS}-{MAX_DECKS}")
+    parser.add_argument('--penetration', type=float, default=DEFAULT_PENETRATION)
+    parser.add_argument('--hit-soft-17', action='store_true', help="dealer hits soft 17")
+    parser.add_argument('--blackjack-payout', type=float, default=None,
+                        help="settle naturals first and pay this multiple (e.g. 1.5); "
+                             "by default naturals are plain 21s, as in the game")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--compare-scalar', type=int, default=0, metavar='ROUNDS',
+                        help="also play this many rounds on the scalar engine and compare the hit-below-17 rates")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = simulate(args.hands, args.thresholds, args.decks, args.penetration,
+                       args.hit_soft_17, args.blackjack_payout, args.seed)
+    elapsed = time.perf_counter() - start
+    print_results(results)
+    total_hands = args.hands * len(args.thresholds)
+    print(f"Simulated {total_hands:,} hands in {elapsed:.2f}s ({total_hands / elapsed:,.0f} hands/sec)")
+
+    if args.compare_scalar:
+        scalar = scalar_rates(args.compare_scalar, args.decks, args.penetration, args.seed)
+        vector = simulate(args.hands, (17,), args.decks, args.penetration, seed=args.seed)[0]
+        print(Colors.HEADER + "=== Scalar Engine Check (hit below 17) ===" + Colors.END)
+        for key, z in rate_z_scores(scalar, vector).items():
+            print(f"{key}: vectorized {vector[key]:.4f}  scalar {scalar[key]:.4f}  z = {z:+.2f}")
+        print(f"ev: vectorized {vector['ev']:+.4f}  scalar {scalar['ev']:+.4f}")
+
+
+if __name__ == "__main__":
+    main()
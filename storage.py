@@ -0,0 +1,228 @@
+import json
+import os
+from contextlib import contextmanager
+
+# Storage backends for players, the leaderboard and the current player.
+#
+# Writes are per row. Inside a batch() they are queued in memory and committed
+# together when the batch ends (one transaction for SQLite, one rewrite per
+# file for JSON), and a batch that raises is discarded as a whole. Loads see
+# the writes still queued in the batch.
+
+PLAYER_DATA_FILE = 'players.json'
+CURRENT_PLAYER_FILE = 'current_player.json'
+LEADERBOARD_FILE = 'leaderboard.json'
+DATABASE_FILE = 'blackjack.db'
+
+_UNCHANGED = object()
+
+
+class Storage:
+    def __init__(self, warn=print):
+        self.warn = warn  # Reports corrupted data that had to be reset
+        self.bytes_written = 0
+        self._depth = 0
+        self._reset_pending()
+
+    def _reset_pending(self):
+        # Pending values by name; None marks a deleted row
+        self._players = {}
+        self._leaderboard = {}
+        self._current = _UNCHANGED
+
+    @contextmanager
+    def batch(self):
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self._reset_pending()
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.flush()
+
+    def flush(self):
+        if self._players or self._leaderboard or self._current is not _UNCHANGED:
+            self._commit(self._players, self._leaderboard, self._current)
+        self._reset_pending()
+
+    def _written(self):
+        if self._depth == 0:
+            self.flush()
+
+    def save_player(self, name, balance):
+        self._players[name] = balance
+        self._written()
+
+    def delete_player(self, name):
+        self._players[name] = None
+        self._written()
+
+    def save_leaderboard_entry(self, name, amount):
+        self._leaderboard[name] = amount
+        self._written()
+
+    def delete_leaderboard_entry(self, name):
+        self._leaderboard[name] = None
+        self._written()
+
+    def save_current_player(self, name):
+        self._current = name
+        self._written()
+
+    def load_players(self):
+        return apply_changes(self._load_players(), self._players, lambda balance: {'balance': balance})
+
+    def load_current_player(self):
+        return self._load_current_player() if self._current is _UNCHANGED else self._current
+
+    def load_leaderboard(self):
+        return apply_changes(self._load_leaderboard(), self._leaderboard)
+
+    # Backends implement the loads of committed data and _commit
+    def _load_players(self):
+        raise NotImplementedError
+
+    def _load_current_player(self):
+        raise NotImplementedError
+
+    def _load_leaderboard(self):
+        raise NotImplementedError
+
+    def _commit(self, players, leaderboard, current):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def apply_changes(data, changes, wrap=lambda value: value):
+    for name, value in changes.items():
+        if value is None:
+            data.pop(name, None)
+        else:
+            data[name] = wrap(value)
+    return data
+
+
+class JsonStorage(Storage):
+    def __init__(self, players_file=PLAYER_DATA_FILE, current_player_file=CURRENT_PLAYER_FILE,
+                 leaderboard_file=LEADERBOARD_FILE, warn=print):
+        super().__init__(warn)
+        self.players_file = players_file
+        self.current_player_file = current_player_file
+        self.leaderboard_file = leaderboard_file
+
+    def _read(self, path, reset_message):
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            self.warn(f"Error: '{path}' is corrupted or contains invalid JSON. {reset_message}")
+            return None
+
+    def _write(self, path, data):
+        # Write the whole file next to the old one and swap it in, so a crash
+        # mid-write never leaves a half-written file behind
+        text = json.dumps(data, indent=4)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+        self.bytes_written += len(text.encode('utf-8'))
+
+    def _load_players(self):
+        return self._read(self.players_file, "Resetting player data.") or {}
+
+    def _load_current_player(self):
+        data = self._read(self.current_player_file, "Resetting current player.")
+        return data.get('current_player') if data else None
+
+    def _load_leaderboard(self):
+        return self._read(self.leaderboard_file, "Resetting leaderboard data.") or {}
+
+    def _commit(self, players, leaderboard, current):
+        if players:
+            data = apply_changes(self._load_players(), players, lambda balance: {'balance': balance})
+            self._write(self.players_file, data)
+        if leaderboard:
+            self._write(self.leaderboard_file, apply_changes(self._load_leaderboard(), leaderboard))
+        if current is not _UNCHANGED:
+            self._write(self.current_player_file, {'current_player': current})
+
+
+class SqliteStorage(Storage):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS players (name TEXT PRIMARY KEY, balance NUMERIC NOT NULL);
+        CREATE TABLE IF NOT EXISTS leaderboard (name TEXT PRIMARY KEY, amount NUMERIC NOT NULL);
+        CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, path=DATABASE_FILE, warn=print):
+        import sqlite3  # Only loaded when the SQLite backend is used
+        super().__init__(warn)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+
+    def _load_players(self):
+        rows = self.conn.execute('SELECT name, balance FROM players ORDER BY rowid')
+        return {name: {'balance': balance} for name, balance in rows}
+
+    def _load_current_player(self):
+        row = self.conn.execute("SELECT value FROM settings WHERE key = 'current_player'").fetchone()
+        return row[0] if row else None
+
+    def _load_leaderboard(self):
+        return dict(self.conn.execute('SELECT name, amount FROM leaderboard ORDER BY rowid'))
+
+    def _commit(self, players, leaderboard, current):
+        with self.conn:
+            for table, column, changes in (('players', 'balance', players), ('leaderboard', 'amount', leaderboard)):
+                upserts = [(name, value) for name, value in changes.items() if value is not None]
+                deletes = [(name,) for name, value in changes.items() if value is None]
+                if upserts:
+                    self.conn.executemany(
+                        f'INSERT INTO {table} (name, {column}) VALUES (?, ?) '
+                        f'ON CONFLICT(name) DO UPDATE SET {column} = excluded.{column}', upserts)
+                if deletes:
+                    self.conn.executemany(f'DELETE FROM {table} WHERE name = ?', deletes)
+                # Rough size of the row data, for reporting
+                self.bytes_written += sum(len(name.encode('utf-8')) + 8 for name, _ in upserts)
+            if current is not _UNCHANGED:
+                self.conn.execute(
+                    "INSERT INTO settings (key, value) VALUES ('current_player', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (current,))
+
+    def close(self):
+        self.conn.close()
+
+
+def migrate_json_to_sqlite(db_path=DATABASE_FILE, source=None, warn=print):
+    # Copy everything from the JSON files into the database in one transaction.
+    # Existing rows with the same names are overwritten, so it is safe to rerun.
+    source = source or JsonStorage(warn=warn)
+    target = SqliteStorage(db_path, warn=warn)
+    players = source.load_players()
+    leaderboard = source.load_leaderboard()
+    with target.batch():
+        for name, data in players.items():
+            target.save_player(name, data['balance'])
+        for name, amount in leaderboard.items():
+            target.save_leaderboard_entry(name, amount)
+        target.save_current_player(source.load_current_player())
+    target.close()
+    return len(players), len(leaderboard)
+
+
+def open_storage(kind='json', db_path=DATABASE_FILE, warn=print):
+    if kind == 'sqlite':
+        return SqliteStorage(db_path, warn=warn)
+    return JsonStorage(warn=warn)
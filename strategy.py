@@ -0,0 +1,128 @@
+import json
+import os
+from functools import lru_cache
+
+from dealer import CARD_RANKS, add_card, dealer_distribution, stand_odds
+
+# Basic strategy solver: the exact expected value of standing, hitting and
+# doubling for every (player total, soft flag, dealer upcard), under this
+# game's rules (dealer stands on all 17s, no hole card peek, a natural is paid
+# like any other 21, and a hand may be doubled after hitting).
+#
+# The dealer's final totals come from dealer.py, computed exactly from the
+# shoe with the upcard and every dealer draw removed. The player's draws use
+# the shoe minus the upcard, which gives a total-dependent strategy.
+
+STRATEGY_VERSION = 2
+STRATEGY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strategy_{}deck.json')
+
+UPCARDS = range(2, 12)
+
+
+def shoe_composition(num_decks):
+    # Number of cards of each value 2-11 in a full shoe; 10, J, Q and K all count 10
+    return tuple(16 * num_decks if value == 10 else 4 * num_decks for value in CARD_RANKS)
+
+
+def remove_card(composition, value):
+    index = value - CARD_RANKS[0]
+    return composition[:index] + (composition[index] - 1,) + composition[index + 1:]
+
+
+def stand_ev(total, outcomes):
+    win, push, loss = stand_odds(total, outcomes)
+    return win - loss
+
+
+def solve_upcard(upcard, num_decks):
+    composition = remove_card(shoe_composition(num_decks), upcard)
+    outcomes = dealer_distribution(upcard, composition)
+    cards = sum(composition)
+    draws = [(CARD_RANKS[index], count / cards) for index, count in enumerate(composition) if count]
+
+    def next_states(total, soft):
+        return [(add_card(total, soft, value), p) for value, p in draws]
+
+    @lru_cache(maxsize=None)
+    def best(total, soft, can_double):
+        # Value of the hand when playing it perfectly from here
+        if total > 21:
+            return -1.0
+        options = [stand_ev(total, outcomes), hit(total, soft, can_double)]
+        if can_double:
+            options.append(double(total, soft))
+        return max(options)
+
+    @lru_cache(maxsize=None)
+    def hit(total, soft, can_double):
+        return sum(p * best(next_total, next_soft, can_double) for (next_total, next_soft), p in next_states(total, soft))
+
+    def double(total, soft):
+        return 2 * sum(p * stand_ev(next_total, outcomes) for (next_total, _), p in next_states(total, soft))
+
+    table = {}
+    for soft in (False, True):
+        for total in range(12 if soft else 4, 22):
+            evs = (stand_ev(total, outcomes), hit(total, soft, True), double(total, soft), hit(total, soft, False))
+            table[total, soft] = evs
+    return table
+
+
+def solve(num_decks):
+    # moves[soft][total][upcard] is a two-letter string: the best move when
+    # doubling is allowed, then the best move when it isn't
+    moves = [[[''] * 12 for _ in range(22)] for _ in range(2)]
+    evs = [[[None] * 12 for _ in range(22)] for _ in range(2)]
+    for upcard in UPCARDS:
+        for (total, soft), (stand, hit, double, hit_no_double) in solve_upcard(upcard, num_decks).items():
+            with_double = max((stand, 's'), (hit, 'h'), (double, 'd'))[1]
+            without_double = 'h' if hit_no_double > stand else 's'
+            moves[soft][total][upcard] = with_double + without_double
+            evs[soft][total][upcard] = [stand, hit, double]
+    return {'version': STRATEGY_VERSION, 'num_decks': num_decks, 'moves': moves, 'ev': evs}
+
+
+class Strategy:
+    def __init__(self, data):
+        self.num_decks = data['num_decks']
+        self.moves = data['moves']
+        self.evs = data['ev']
+
+    def move(self, total, soft, upcard, can_double=True):
+        # O(1) lookup of the best move ('h', 's' or 'd') for a hand
+        if total > 21:
+            return 's'
+        if total < 4:
+            return 'h'
+        return self.moves[soft][total][upcard][0 if can_double else 1]
+
+    def ev(self, total, soft, upcard):
+        # Expected values of [stand, hit, double] per unit bet
+        return self.evs[soft][total][upcard]
+
+
+_strategies = {}
+
+
+def load_strategy(num_decks, path=None):
+    # Load the strategy table for a deck count from its cache file,
+    # solving and writing it first if it is missing or out of date
+    if num_decks in _strategies:
+        return _strategies[num_decks]
+    path = path or STRATEGY_FILE.format(num_decks)
+    data = None
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            data = None
+    if not data or data.get('version') != STRATEGY_VERSION or data.get('num_decks') != num_decks:
+        data = solve(num_decks)
+        # Write to a temporary file first so other processes never read half a table
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    strategy = _strategies[num_decks] = Strategy(data)
+    return strategy
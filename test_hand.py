@@ -0,0 +1,64 @@
+import random
+
+from BJ import CARD_VALUES, RANKS, SUITS, Hand
+
+# Hand keeps its value up to date as cards are added; it must agree with the
+# original rule of summing every card, aces as 11, then taking 10 off for each
+# ace while the total is over 21.
+
+
+def card(rank, suit=0):
+    return RANKS.index(rank) * len(SUITS) + suit
+
+
+def original_value(cards):
+    value = sum(CARD_VALUES[code] for code in cards)
+    aces = sum(1 for code in cards if CARD_VALUES[code] == 11)
+    while value > 21 and aces:
+        value -= 10
+        aces -= 1
+    return value
+
+
+def hand_of(ranks):
+    hand = Hand()
+    for rank in ranks:
+        hand.add_card(card(rank))
+    return hand
+
+
+def test_soft_and_multi_ace_hands():
+    cases = {
+        ('A', '6'): 17,
+        ('A', '6', '5'): 12,
+        ('A', 'A'): 12,
+        ('A', 'A', '9'): 21,
+        ('A', 'A', 'A', 'A'): 14,
+        ('A', 'A', 'A', 'A', '7'): 21,
+        ('A', 'A', 'A', 'A', '8'): 12,
+        ('A', '5', 'A', 'K'): 17,
+        ('K', 'Q', 'A'): 21,
+        ('K', 'Q', 'A', 'A'): 22,
+    }
+    for ranks, value in cases.items():
+        hand = hand_of(ranks)
+        assert hand.value == value == original_value(hand.cards), ranks
+        assert hand.busted == (value > 21), ranks
+
+
+def test_blackjack_only_on_two_cards():
+    assert hand_of(('A', 'K')).is_blackjack
+    assert not hand_of(('A', '5', '5')).is_blackjack
+    assert not hand_of(('K', 'Q')).is_blackjack
+
+
+def test_random_hands_match_original_rule():
+    rng = random.Random(5)
+    for _ in range(20_000):
+        hand = Hand()
+        # Ace-heavy draws, so hands with several aces come up often
+        for _ in range(rng.randint(2, 8)):
+            rank = 'A' if rng.random() < 0.3 else rng.choice(RANKS)
+            hand.add_card(card(rank, rng.randrange(len(SUITS))))
+            assert hand.value == original_value(hand.cards), hand.cards
+            assert hand.busted == (hand.value > 21)
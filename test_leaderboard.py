@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+import leaderboard
+from leaderboard import Leaderboard
+from storage import JsonStorage
+
+# Ranks must match a stable sort of the entries by amount, best first, with
+# ties kept in the order the names first got an entry.
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return JsonStorage(str(tmp_path / 'players.json'), str(tmp_path / 'current_player.json'),
+                       str(tmp_path / 'leaderboard.json'))
+
+
+def expected_order(amounts, first_seen):
+    return sorted(amounts, key=lambda name: (-amounts[name], first_seen.index(name)))
+
+
+def check(board, amounts, first_seen):
+    order = expected_order(amounts, first_seen)
+    assert [name for name, _ in board.top()] == order
+    assert [rank for rank, _, _ in board.page(1, len(order) or 1)] == list(range(1, len(order) + 1))
+    for rank, name in enumerate(order, start=1):
+        assert board.rank(name) == rank
+        assert board.get(name) == amounts[name]
+
+
+def test_rank_and_ties_after_updates_and_removals(storage):
+    board = Leaderboard(storage)
+    for name, amount in (('Ann', 100), ('Bob', 300), ('Cy', 100), ('Dee', 200)):
+        board.add(name, amount)
+    assert board.top() == [('Bob', 300), ('Dee', 200), ('Ann', 100), ('Cy', 100)]
+    # Cy catches up with Dee and ranks first of the two, having had an entry first
+    board.add('Cy', 100)
+    assert board.top() == [('Bob', 300), ('Cy', 200), ('Dee', 200), ('Ann', 100)]
+    assert board.rank('Cy') == 2
+    assert board.rank('Dee') == 3
+    del board['Bob']
+    assert board.rank('Cy') == 1
+    assert board.rank('Bob') is None
+    # A removed name that comes back ranks as a new entry among ties
+    board.add('Bob', 100)
+    assert board.top() == [('Cy', 200), ('Dee', 200), ('Ann', 100), ('Bob', 100)]
+    assert board.page(2, 3) == [(4, 'Bob', 100)]
+    assert board.page_count(3) == 2
+
+
+def test_random_updates_match_a_stable_sort(storage, monkeypatch):
+    # Small blocks, so splits and emptied blocks happen often
+    monkeypatch.setattr(leaderboard, 'BLOCK_SIZE', 4)
+    rng = random.Random(9)
+    board = Leaderboard(storage)
+    amounts = {}
+    first_seen = []
+    for step in range(3000):
+        name = f"P{rng.randrange(80)}"
+        if name in amounts and rng.random() < 0.2:
+            del board[name]
+            del amounts[name]
+            first_seen.remove(name)
+        else:
+            amount = rng.randrange(-5, 6) * 10
+            board.add(name, amount)
+            if name not in amounts:
+                first_seen.append(name)
+            amounts[name] = amounts.get(name, 0) + amount
+        if step % 100 == 0:
+            check(board, amounts, first_seen)
+    check(board, amounts, first_seen)
+    assert len(board) == len(amounts)
+    page_size = 7
+    pages = [board.page(number, page_size) for number in range(1, board.page_count(page_size) + 1)]
+    assert [name for page in pages for _, name, _ in page] == expected_order(amounts, first_seen)
+
+
+def test_flush_saves_and_reloads_in_rank_order(storage):
+    board = Leaderboard(storage)
+    board.add('Ann', 100)
+    board.add('Bob', 100)
+    board.add('Cy', 50)
+    board.flush()
+    del board['Cy']
+    board.flush()
+    reloaded = Leaderboard(storage)
+    assert reloaded.top() == [('Ann', 100), ('Bob', 100)]
@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+import pytest
+
+from BJ import RANKS, SUITS, Hand, Seat
+from recorder import MAX_CARDS, HandRecorder, read_history
+
+# What the recorder writes must read back as the same round: cards, stakes,
+# payouts, outcomes and the moves that follow from them.
+
+
+def card(rank, suit=0):
+    return RANKS.index(rank) * len(SUITS) + suit
+
+
+def seat(name, ranks, bet, doubled=False):
+    player = Seat(name, is_ai=True)
+    player.hand = Hand()
+    for rank in ranks:
+        player.hand.add_card(card(rank))
+    player.hand.is_doubled = doubled
+    player.bet = bet
+    return player
+
+
+def engine(players, dealer_ranks, number=0):
+    dealer = Hand()
+    for rank in dealer_ranks:
+        dealer.add_card(card(rank))
+    return SimpleNamespace(players=players, dealer=dealer, reshuffled=number == 0, shoe_position=7 * number,
+                           running_count=-3, deck=SimpleNamespace(shuffles=1))
+
+
+def test_round_trip_with_doubled_busted_and_long_hands(tmp_path):
+    path = str(tmp_path / 'history.bjh')
+    # Twenty aces and a ten: the longest hand a player can be dealt
+    long_ranks = ['A'] * 20 + ['10']
+    players = [
+        seat('Ann', ['5', '6', 'K'], 200, doubled=True),
+        seat('Bob', ['10', '6', '9'], 100),
+        seat('Cy', ['10', '7'], 150.5),
+        seat('Dee', long_ranks, 100),
+    ]
+    results = [('win', 400), ('bust', 0), ('push', 150.5), ('bust', 0)]
+    dealer_ranks = ['A'] * 6 + ['2'] * 5 + ['A'] * 6  # 17 cards, standing on 17
+    recorder = HandRecorder(path, seed=2 ** 64 - 1, num_decks=8, penetration=0.75)
+    recorder.record_round(engine(players, dealer_ranks), results)
+    recorder.record_round(engine(players[:2], ['10', '7'], 1), results[:2])
+    recorder.close()
+
+    first, second = read_history(path)
+    assert first['session']['seed'] == 2 ** 64 - 1
+    assert first['reshuffled'] and not second['reshuffled']
+    assert first['dealer'] == [card(rank) for rank in dealer_ranks]
+    assert len(first['dealer']) > MAX_CARDS
+    assert [seat['name'] for seat in first['seats']] == ['Ann', 'Bob', 'Cy', 'Dee']
+    ann, bob, cy, dee = first['seats']
+    assert ann['doubled'] and ann['moves'] == 'd' and ann['outcome'] == 'win'
+    assert ann['bet'] == 200 and ann['payout'] == 400
+    assert bob['outcome'] == 'bust' and bob['moves'] == 'h' and not bob['doubled']
+    assert cy['bet'] == cy['payout'] == 150.5 and cy['moves'] == 's'
+    assert dee['cards'] == [card(rank) for rank in long_ranks]
+    assert dee['moves'] == 'h' * 19
+    assert [seat['name'] for seat in second['seats']] == ['Ann', 'Bob']
+    assert second['position'] == 7
+
+
+def test_analytics_reads_long_hands(tmp_path):
+    pytest.importorskip('numpy')
+    from analytics import analyze
+
+    path = str(tmp_path / 'history.bjh')
+    recorder = HandRecorder(path, seed=1, num_decks=8, penetration=0.75)
+    players = [seat('Dee', ['A'] * 20 + ['10'], 100), seat('Eve', ['9', '9'], 100)]
+    recorder.record_round(engine(players, ['10', '8']), [('bust', 0), ('win', 200)])
+    recorder.close()
+    # One record per chunk, so the continuation must stay with its hand
+    totals = analyze([path], chunk_records=1)
+    assert totals.rounds == 1 and totals.hands == 2
+    # Nineteen hits, and only the last one, from a hard 20, busts
+    assert totals.hits.sum() == 19
+    assert totals.hit_busts.sum() == 1 and totals.hit_busts[20] == 1
+
+
+def test_rejects_logs_without_a_header(tmp_path):
+    path = str(tmp_path / 'history.bjh')
+    HandRecorder(path, seed=1).close()
+    with open(path, 'rb') as f:
+        header = f.read()
+    recorder = HandRecorder(path, seed=1)
+    recorder.record_round(engine([seat('Ann', ['10', '7'], 100)], ['10', '8']), [('loss', 0)])
+    recorder.close()
+    with open(path, 'rb') as f:
+        records = f.read()[2 * len(header):]
+    with open(path, 'wb') as f:
+        f.write(records)
+    with pytest.raises(ValueError, match="is not a version 5 hand history"):
+        list(read_history(path))
+
+
+def test_rejects_seeds_the_header_cannot_hold(tmp_path):
+    with pytest.raises(ValueError):
+        HandRecorder(str(tmp_path / 'history.bjh'), seed=-1)
@@ -0,0 +1,19 @@
+from simulator import rate_z_scores, scalar_rates, simulate
+
+# The vectorized simulator and the scalar engine play the same policy (hit
+# below 17, flat bets), so their rates must agree within sampling error.
+# Fixed seeds keep the check deterministic.
+
+SCALAR_ROUNDS = 20_000
+VECTOR_HANDS = 200_000
+MAX_Z = 4.0
+
+
+def test_simulator_agrees_with_scalar_engine():
+    scalar = scalar_rates(SCALAR_ROUNDS, seed=1)
+    vector = simulate(VECTOR_HANDS, (17,), seed=1)[0]
+    for key, z in rate_z_scores(scalar, vector).items():
+        assert abs(z) < MAX_Z, f"{key}: scalar {scalar[key]:.4f}, vectorized {vector[key]:.4f}, z = {z:+.2f}"
+    # Each hand's result is at most one unit either way
+    ev_se = (1 / scalar['hands'] + 1 / vector['hands']) ** 0.5
+    assert abs(scalar['ev'] - vector['ev']) < MAX_Z * ev_se
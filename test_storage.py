@@ -0,0 +1,83 @@
+import pytest
+
+from storage import JsonStorage, SqliteStorage
+
+# Both backends queue the writes made inside a batch() and commit them
+# together when it ends; a batch that raises leaves the saved data untouched.
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def make_storage(request, tmp_path):
+    opened = []
+
+    def make():
+        if request.param == 'sqlite':
+            storage = SqliteStorage(str(tmp_path / 'blackjack.db'))
+        else:
+            storage = JsonStorage(str(tmp_path / 'players.json'), str(tmp_path / 'current_player.json'),
+                                  str(tmp_path / 'leaderboard.json'))
+        opened.append(storage)
+        return storage
+
+    yield make
+    for storage in opened:
+        storage.close()
+
+
+def test_batch_commits_when_it_ends(make_storage):
+    storage = make_storage()
+    storage.save_player('Old', 100)
+    with storage.batch():
+        storage.save_player('Ann', 500)
+        storage.save_leaderboard_entry('Ann', 250)
+        storage.delete_player('Old')
+        storage.save_current_player('Ann')
+        # Nothing reaches the disk or database until the batch ends
+        assert make_storage().load_players() == {'Old': {'balance': 100}}
+    reopened = make_storage()
+    assert reopened.load_players() == {'Ann': {'balance': 500}}
+    assert reopened.load_leaderboard() == {'Ann': 250}
+    assert reopened.load_current_player() == 'Ann'
+
+
+def test_batch_rolls_back_on_exception(make_storage):
+    storage = make_storage()
+    storage.save_player('Ann', 500)
+    storage.save_current_player('Ann')
+    with pytest.raises(RuntimeError):
+        with storage.batch():
+            storage.save_player('Ann', 900)
+            storage.save_player('Bob', 100)
+            storage.save_leaderboard_entry('Bob', 50)
+            storage.save_current_player('Bob')
+            raise RuntimeError("round failed")
+    for loaded in (storage, make_storage()):
+        assert loaded.load_players() == {'Ann': {'balance': 500}}
+        assert loaded.load_leaderboard() == {}
+        assert loaded.load_current_player() == 'Ann'
+    # The storage is usable again after the failed batch
+    storage.save_player('Bob', 100)
+    assert make_storage().load_players() == {'Ann': {'balance': 500}, 'Bob': {'balance': 100}}
+
+
+def test_nested_batches_commit_with_the_outer_one(make_storage):
+    storage = make_storage()
+    with storage.batch():
+        with storage.batch():
+            storage.save_player('Ann', 500)
+        assert make_storage().load_players() == {}
+    assert make_storage().load_players() == {'Ann': {'balance': 500}}
+
+
+def test_loads_inside_a_batch_see_pending_writes(make_storage):
+    storage = make_storage()
+    storage.save_player('Ann', 500)
+    storage.save_leaderboard_entry('Ann', 250)
+    with storage.batch():
+        storage.save_player('Bob', 100)
+        storage.delete_player('Ann')
+        storage.save_leaderboard_entry('Ann', 300)
+        storage.save_current_player('Bob')
+        assert storage.load_players() == {'Bob': {'balance': 100}}
+        assert storage.load_leaderboard() == {'Ann': 300}
+        assert storage.load_current_player() == 'Bob'